@@ -1,941 +1,360 @@
-import streamlit as st
-import pandas as pd
-import json
-import uuid
-import time
-import re
-import copy
-from datetime import datetime, timedelta
-
-# =====================================================================
-# 页面配置
-# =====================================================================
-st.set_page_config(
-    page_title="IATF 审计转换工具 (v70.6.1 地址分离修复版)",
-    page_icon="🛡️",
-    layout="wide"
-)
-
-# =====================================================================
-# 侧边栏：模板与模式配置
-# =====================================================================
-with st.sidebar:
-    st.header("⚙️ 全局配置")
-    st.divider()
-    
-    st.markdown("### 🔍 提取模式选择")
-    run_mode = st.radio(
-        "请根据报告类型选择：",
-        (
-            "纯净标准模式 (无附属场所)", 
-            "单提取：EMS 扩展场所 (F21-M25)", 
-            "单提取：RL 支持场所 (F27-N32)",
-            "全量综合模式 (提取 EMS + RL + 被支持场所)"
-        ),
-        index=3
-    )
-    st.divider()
-    
-    st.info("💡 请上传您的 JSON 模板。程序将把该文件作为完整的底层骨架。")
-    user_template_file = st.file_uploader("上传基础 JSON 模板", type=["json"])
-    
-    base_template_data = None
-    if user_template_file:
-        try:
-            base_template_data = json.load(user_template_file)
-            st.success(f"✅ 已加载底座: {user_template_file.name}")
-        except Exception as e:
-            st.error(f"❌ 解析失败: {e}")
-            st.stop()
-    else:
-        st.warning("👈 请先上传底座文件以启动程序。")
-        st.stop()
-
-# =====================================================================
-# 通用辅助函数区
-# =====================================================================
-def ensure_path(d, path):
-    current = d
-    for key in path:
-        if key not in current or not isinstance(current[key], dict):
-            current[key] = {}
-        current = current[key]
-    return current
-
-def safe_get(obj, key, default=""):
-    if isinstance(obj, dict):
-        return obj.get(key, default)
-    return default
-
-def extract_and_format_english_name(raw_val):
-    clean_val = str(raw_val).replace("姓名:", "").replace("Name:", "").strip()
-    if not clean_val: return ""
-    eng_only = re.sub(r'[^a-zA-Z\s]', ' ', clean_val).strip()
-    eng_only = re.sub(r'\s+', ' ', eng_only)
-    if eng_only:
-        parts = eng_only.split()
-        if len(parts) >= 2 and parts[0].isupper() and not parts[1].isupper():
-            return f"{parts[1]} {parts[0]}"
-        else:
-            return eng_only
-    return clean_val
-
-# 💥 唯一修改点：深度优化的地址解析函数 💥
-def parse_chinese_address(addr_str):
-    province, city, street = "", "", addr_str
-    if not addr_str: return province, city, street
-
-    # 预处理：移除开头可能的“中国”
-    clean_addr = re.sub(r'^中国', '', str(addr_str)).strip()
-    
-    # 1. 提取省份/直辖市
-    p_pattern = r'(.+?(省|自治区|北京市|上海市|天津市|重庆市|北京|上海|天津|重庆))'
-    p_match = re.search(p_pattern, clean_addr)
-    
-    if p_match:
-        province = p_match.group(1).strip()
-        if province in ["北京", "上海", "天津", "重庆"]:
-            province += "市"
-        clean_addr = clean_addr[len(p_match.group(1)):].strip()
-    
-    # 2. 提取城市 (独立于省份运行，并移除单独的"州"匹配，防止荆州市被拆断)
-    c_pattern = r'(.+?(市|自治州|地区|盟))'
-    c_match = re.search(c_pattern, clean_addr)
-    
-    if c_match:
-        city = c_match.group(1).strip()
-        street = clean_addr[len(city):].strip()
-    else:
-        # 处理直辖市
-        if province and any(x in province for x in ["北京", "上海", "天津", "重庆"]):
-            city = province
-            street = clean_addr
-        else:
-            city = ""
-            street = clean_addr
-
-    return province, city, street
-
-# =====================================================================
-# 独立模块 1：EMS 扩展场所提取器
-# =====================================================================
-def extract_ems_sites(info_df):
-    ems_sites = []
-    if info_df.empty: return ems_sites
-    header_r = -1
-    col_map = {}
-    row_start, row_end = 20, min(25, info_df.shape[0])
-    col_start, col_end = 5, min(13, info_df.shape[1])
-
-    for r in range(row_start, row_end):
-        for c in range(col_start, col_end):
-            val = str(info_df.iloc[r, c]).strip().upper()
-            if "EMS扩展场所信息" in val or "扩展制造场所" in val or "扩展现场" in val:
-                header_r = r
-                for c_scan in range(col_start, col_end):
-                    h_val = str(info_df.iloc[r, c_scan]).strip()
-                    if "中文名称" in h_val: col_map['name_cn'] = c_scan
-                    elif "英文名称" in h_val: col_map['name_en'] = c_scan
-                    elif "中文地址" in h_val: col_map['addr_cn'] = c_scan
-                    elif "英文地址" in h_val: col_map['addr_en'] = c_scan
-                    elif "邮编" in h_val or "邮政编码" in h_val: col_map['zip'] = c_scan
-                    elif "USI" in h_val.upper(): col_map['usi'] = c_scan
-                    elif "人数" in h_val: col_map['emp'] = c_scan
-                break
-        if header_r != -1: break
-            
-    if header_r != -1:
-        for r in range(header_r + 1, row_end):
-            def safe_get_cell(row, col_idx):
-                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
-                v = str(info_df.iloc[row, col_idx]).strip()
-                return "" if v.lower() == 'nan' else v
-
-            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
-            name_en = safe_get_cell(r, col_map.get('name_en', -1))
-            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
-            
-            if not name_cn and not addr_cn: continue
-            if "名称" in name_cn and "地址" in addr_cn: continue
-            
-            full_site_name = name_cn
-            if name_en and name_en not in name_cn:
-                full_site_name = f"{name_cn} {name_en}".strip()
-
-            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
-            zip_code = safe_get_cell(r, col_map.get('zip', -1))
-            usi = safe_get_cell(r, col_map.get('usi', -1))
-            emp = safe_get_cell(r, col_map.get('emp', -1))
-
-            ems_street, ems_city, ems_state, ems_country = addr_en, "", "", ""
-            if addr_en:
-                clean_eng = addr_en.replace('，', ',')
-                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
-                if len(parts) >= 3:
-                    ems_country = parts[-1]
-                    ems_state = parts[-2]
-                    ems_city = parts[-3]
-                    ems_street = ", ".join(parts[:-3])
-                else:
-                    ems_street = addr_en
-
-            ems_zh_p, ems_zh_c, ems_zh_s = parse_chinese_address(addr_cn)
-
-            site_obj = {
-                "Id": str(uuid.uuid4()),
-                "SiteName": full_site_name,
-                "IATF_USI": usi,
-                "Usi": usi,
-                "TotalNumberEmployees": emp,
-                "AddressNative": {"Street1": ems_zh_s, "City": ems_zh_c, "State": ems_zh_p, "Country": "中国", "PostalCode": zip_code},
-                "Address": {"Street1": ems_street, "City": ems_city, "State": ems_state, "Country": ems_country, "PostalCode": zip_code}
-            }
-            ems_sites.append(site_obj)
-    return ems_sites
-
-# =====================================================================
-# 独立模块 2：RL 支持场所提取器
-# =====================================================================
-def extract_rl_sites(info_df):
-    support_sites = []
-    if info_df.empty: return support_sites
-    header_r = -1
-    col_map = {}
-    rl_row_start, rl_row_end = 26, min(32, info_df.shape[0])
-    rl_col_start, rl_col_end = 5, min(14, info_df.shape[1])
-
-    for r in range(rl_row_start, rl_row_end):
-        for c in range(rl_col_start, rl_col_end):
-            val = str(info_df.iloc[r, c]).strip().upper()
-            if ("支持场所" in val or "RL" in val) and "被" not in val:
-                header_r = r
-                for c_scan in range(rl_col_start, rl_col_end):
-                    h_val = str(info_df.iloc[r, c_scan]).strip()
-                    if "中文名称" in h_val: col_map['name_cn'] = c_scan
-                    elif "英文名称" in h_val: col_map['name_en'] = c_scan
-                    elif "中文地址" in h_val: col_map['addr_cn'] = c_scan
-                    elif "英文地址" in h_val: col_map['addr_en'] = c_scan
-                    elif "邮编" in h_val or "邮政编码" in h_val: col_map['zip'] = c_scan
-                    elif "USI" in h_val.upper(): col_map['usi'] = c_scan
-                    elif "人数" in h_val: col_map['emp'] = c_scan
-                    elif "支持功能" in h_val: col_map['func'] = c_scan
-                break
-        if header_r != -1: break
-            
-    if header_r != -1:
-        for r in range(header_r + 1, rl_row_end):
-            def safe_get_cell(row, col_idx):
-                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
-                v = str(info_df.iloc[row, col_idx]).strip()
-                return "" if v.lower() == 'nan' else v
-
-            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
-            name_en = safe_get_cell(r, col_map.get('name_en', -1))
-            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
-            
-            if not name_cn and not addr_cn: continue
-            if "名称" in name_cn and "地址" in addr_cn: continue
-            
-            full_site_name = name_cn
-            if name_en and name_en not in name_cn:
-                full_site_name = f"{name_cn} {name_en}".strip()
-
-            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
-            zip_code = safe_get_cell(r, col_map.get('zip', -1))
-            usi = safe_get_cell(r, col_map.get('usi', -1))
-            emp = safe_get_cell(r, col_map.get('emp', -1))
-            func = safe_get_cell(r, col_map.get('func', -1))
-
-            rl_street, rl_city, rl_state, rl_country = addr_en, "", "", ""
-            if addr_en:
-                clean_eng = addr_en.replace('，', ',')
-                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
-                if len(parts) >= 3:
-                    rl_country = parts[-1]
-                    rl_state = parts[-2]
-                    rl_city = parts[-3]
-                    rl_street = ", ".join(parts[:-3])
-                else:
-                    rl_street = addr_en
-
-            rl_zh_p, rl_zh_c, rl_zh_s = parse_chinese_address(addr_cn)
-
-            site_obj = {
-                "Id": str(uuid.uuid4()),
-                "SiteName": full_site_name,
-                "Comments": func,
-                "IATF_USI": usi,
-                "Usi": usi,
-                "TotalNumberEmployees": emp,
-                "AddressNative": {"Street1": rl_zh_s, "City": rl_zh_c, "State": rl_zh_p, "Country": "中国", "PostalCode": zip_code},
-                "Address": {"Street1": rl_street, "City": rl_city, "State": rl_state, "Country": rl_country, "PostalCode": zip_code}
-            }
-            support_sites.append(site_obj)
-    return support_sites
-
-# =====================================================================
-# 独立模块 3：被支持场所提取器
-# =====================================================================
-def extract_receiving_sites(info_df):
-    receiving_sites = []
-    if info_df.empty: return receiving_sites
-    header_r = -1
-    col_map = {}
-    
-    rec_row_start, rec_row_end = 33, min(38, info_df.shape[0])
-    rec_col_start, rec_col_end = 5, min(14, info_df.shape[1])
-
-    for r in range(rec_row_start, rec_row_end):
-        for c in range(rec_col_start, rec_col_end):
-            val = str(info_df.iloc[r, c]).strip().upper()
-            if "被支持场所" in val:
-                header_r = r
-                for c_scan in range(rec_col_start, rec_col_end):
-                    h_val = str(info_df.iloc[r, c_scan]).strip()
-                    if "中文名称" in h_val: col_map['name_cn'] = c_scan
-                    elif "英文名称" in h_val: col_map['name_en'] = c_scan
-                    elif "中文地址" in h_val: col_map['addr_cn'] = c_scan
-                    elif "英文地址" in h_val: col_map['addr_en'] = c_scan
-                    elif "邮编" in h_val or "邮政编码" in h_val: col_map['zip'] = c_scan
-                    elif "USI" in h_val.upper(): col_map['usi'] = c_scan
-                    elif "人数" in h_val: col_map['emp'] = c_scan
-                    elif "支持功能" in h_val: col_map['func'] = c_scan
-                break
-        if header_r != -1: break
-            
-    if header_r != -1:
-        for r in range(header_r + 1, rec_row_end):
-            def safe_get_cell(row, col_idx):
-                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
-                v = str(info_df.iloc[row, col_idx]).strip()
-                return "" if v.lower() == 'nan' else v
-
-            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
-            name_en = safe_get_cell(r, col_map.get('name_en', -1))
-            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
-            
-            if not name_cn and not addr_cn: continue
-            if "名称" in name_cn and "地址" in addr_cn: continue
-            
-            full_site_name = name_cn
-            if name_en and name_en not in name_cn:
-                full_site_name = f"{name_cn} {name_en}".strip()
-
-            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
-            zip_code = safe_get_cell(r, col_map.get('zip', -1))
-            usi = safe_get_cell(r, col_map.get('usi', -1))
-            emp = safe_get_cell(r, col_map.get('emp', -1))
-            func = safe_get_cell(r, col_map.get('func', -1))
-
-            rec_street, rec_city, rec_state, rec_country = addr_en, "", "", ""
-            if addr_en:
-                clean_eng = addr_en.replace('，', ',')
-                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
-                if len(parts) >= 3:
-                    rec_country = parts[-1]
-                    rec_state = parts[-2]
-                    rec_city = parts[-3]
-                    rec_street = ", ".join(parts[:-3])
-                else:
-                    rec_street = addr_en
-
-            rec_zh_p, rec_zh_c, rec_zh_s = parse_chinese_address(addr_cn)
-
-            site_obj = {
-                "Id": str(uuid.uuid4()),
-                "SiteName": full_site_name,
-                "Comments": func,
-                "IATF_USI": usi,
-                "Usi": usi,
-                "TotalNumberEmployees": emp,
-                "AddressNative": {"Street1": rec_zh_s, "City": rec_zh_c, "State": rec_zh_p, "Country": "中国", "PostalCode": zip_code},
-                "Address": {"Street1": rec_street, "City": rec_city, "State": rec_state, "Country": rec_country, "PostalCode": zip_code}
-            }
-            receiving_sites.append(site_obj)
-    return receiving_sites
-
-# =====================================================================
-# 主流程区：核心转换逻辑
-# =====================================================================
-def generate_json_logic(excel_file, base_data, mode):
-    final_json = copy.deepcopy(base_data)
-    
-    try:
-        xls = pd.ExcelFile(excel_file)
-        db_df = pd.read_excel(xls, sheet_name='数据库', header=None) if '数据库' in xls.sheet_names else pd.read_excel(xls, sheet_name=0, header=None)
-        proc_df = pd.read_excel(xls, sheet_name='过程清单') if '过程清单' in xls.sheet_names else pd.DataFrame()
-        info_df = pd.read_excel(xls, sheet_name='信息', header=None) if '信息' in xls.sheet_names else pd.DataFrame()
-        perf_df = pd.read_excel(xls, sheet_name='过程绩效', header=None) if '过程绩效' in xls.sheet_names else pd.DataFrame()
-        
-        if '文件清单' in xls.sheet_names:
-            doc_list_df = pd.read_excel(xls, sheet_name='文件清单', header=None)
-        else:
-            doc_list_df = pd.read_excel(xls, sheet_name=xls.sheet_names[8], header=None) if len(xls.sheet_names) >= 9 else pd.DataFrame()
-    except Exception as e:
-        raise ValueError(f"Excel 读取失败: {str(e)}")
-
-    def find_val_by_key(df, keywords, col_offset=1):
-        if df.empty: return ""
-        for r in range(df.shape[0]):
-            for c in range(df.shape[1]):
-                cell_val = str(df.iloc[r, c]).strip()
-                for k in keywords:
-                    if k in cell_val:
-                        if c + col_offset < df.shape[1]:
-                            return str(df.iloc[r, c + col_offset]).strip()
-        return ""
-        
-    def get_db_val(r, c):
-        try:
-            val = db_df.iloc[r, c]
-            return str(val).strip() if pd.notna(val) else ""
-        except: return ""
-
-    raw_name_full = find_val_by_key(db_df, ["姓名", "Auditor Name"]) or get_db_val(5, 1)
-    raw_name = raw_name_full.replace("姓名:", "").replace("Name:", "").strip() if raw_name_full else ""
-    formatted_team_name = extract_and_format_english_name(raw_name_full)
-
-    ccaa_raw = find_val_by_key(db_df, ["审核员CCAA", "CCAA"]) or get_db_val(4, 1)
-    caa_no = ""
-    if ccaa_raw:
-        match = re.search(r'(?:CCAA[:：\s-])\s*(.*)', ccaa_raw, re.IGNORECASE | re.DOTALL)
-        caa_no = match.group(1).strip() if match else ccaa_raw.strip()
-
-    auditor_id = ""
-    if not info_df.empty:
-        for r in range(info_df.shape[0]):
-            for c in range(info_df.shape[1]):
-                cell_text = str(info_df.iloc[r, c])
-                if "IATF Card" in cell_text or "IATF卡号" in cell_text:
-                    if c + 1 < info_df.shape[1]:
-                        raw_val = str(info_df.iloc[r, c + 1]).strip()
-                        raw_val = raw_val.replace('\n', ' ').replace('\r', ' ')
-                        auditor_id = re.sub(r'^IATF[:：\s-]*', '', raw_val, flags=re.IGNORECASE).strip()
-                        if len(auditor_id) > 4: break
-            if auditor_id and len(auditor_id) > 4: break
-
-    start_date_raw = find_val_by_key(db_df, ["审核开始日期", "审核开始时间"]) or get_db_val(2, 1)
-    end_date_raw = find_val_by_key(db_df, ["审核结束日期", "审核结束时间"]) or get_db_val(3, 1)
-    
-    def fmt_iso(val):
-        try:
-            clean_val = str(val).replace('年', '-').replace('月', '-').replace('日', '')
-            dt = pd.to_datetime(clean_val, errors='coerce')
-            if pd.notna(dt): return dt.strftime('%Y-%m-%d') + "T00:00:00.000Z"
-        except: pass
-        return ""
-        
-    start_iso, end_iso = fmt_iso(start_date_raw), fmt_iso(end_date_raw)
-
-    kpi_map = {}
-    time_period = ""
-    
-    if not perf_df.empty:
-        if perf_df.shape[0] > 1 and perf_df.shape[1] > 5:
-            raw_time = str(perf_df.iloc[1, 5]).strip()
-            time_period = fmt_iso(raw_time)
-            
-        header_r = -1
-        col_map = {'proc': -1, 'kpi': -1, 'target': -1, 'result': -1, 'trend': -1}
-        
-        for r in range(min(10, perf_df.shape[0])):
-            for c in range(perf_df.shape[1]):
-                val = str(perf_df.iloc[r, c]).strip().upper()
-                if val == "过程" or "KPI名称" in val:
-                    header_r = r
-                    for scan_c in range(perf_df.shape[1]):
-                        h_val = str(perf_df.iloc[r, scan_c]).strip().upper()
-                        if ("过程" == h_val or "PROCESS" in h_val) and col_map['proc'] == -1: 
-                            col_map['proc'] = scan_c
-                        elif ("KPI" in h_val or "指标" in h_val) and col_map['kpi'] == -1: 
-                            col_map['kpi'] = scan_c
-                        elif ("目标" in h_val or "TARGET" in h_val) and col_map['target'] == -1: 
-                            col_map['target'] = scan_c
-                        elif ("结果" in h_val or "RESULT" in h_val) and col_map['result'] == -1: 
-                            col_map['result'] = scan_c
-                        elif ("趋势" in h_val or "TREND" in h_val) and col_map['trend'] == -1: 
-                            col_map['trend'] = scan_c
-                    break
-            if header_r != -1: break
-            
-        if header_r != -1:
-            current_process = ""
-            for r in range(header_r + 1, perf_df.shape[0]):
-                proc_val = str(perf_df.iloc[r, col_map['proc']]).strip() if col_map.get('proc', -1) != -1 else ""
-                
-                if proc_val and proc_val.lower() != 'nan':
-                    current_process = proc_val
-                    
-                kpi_val = str(perf_df.iloc[r, col_map['kpi']]).strip() if col_map.get('kpi', -1) != -1 else ""
-                if not kpi_val or kpi_val.lower() == 'nan':
-                    continue  
-                    
-                target_val = str(perf_df.iloc[r, col_map['target']]).strip() if col_map.get('target', -1) != -1 else ""
-                result_val = str(perf_df.iloc[r, col_map['result']]).strip() if col_map.get('result', -1) != -1 else ""
-                trend_val = str(perf_df.iloc[r, col_map['trend']]).strip() if col_map.get('trend', -1) != -1 else ""
-                
-                trend_mapped = "0"
-                if "积极" in trend_val or "1" == trend_val: trend_mapped = "1"
-                elif "消极" in trend_val or "-1" == trend_val: trend_mapped = "-1"
-                elif "一贯" in trend_val or "0" == trend_val: trend_mapped = "0"
-                else: trend_mapped = trend_val if trend_val and trend_val.lower() != 'nan' else "0"
-                
-                target_val = "" if target_val.lower() == 'nan' else target_val
-                result_val = "" if result_val.lower() == 'nan' else result_val
-                
-                if current_process not in kpi_map:
-                    kpi_map[current_process] = []
-                    
-                kpi_map[current_process].append({
-                    "KPI": kpi_val,
-                    "CurrentTarget": target_val,
-                    "Results": result_val,
-                    "TrendLastAudit": trend_mapped,
-                    "TimePeriodFrom": time_period
-                })
-    
-    next_audit_iso = ""
-    try:
-        clean_end = str(end_date_raw).replace('年', '-').replace('月', '-').replace('日', '')
-        end_dt = pd.to_datetime(clean_end, errors='coerce')
-        if pd.notna(end_dt): next_audit_iso = (end_dt + timedelta(days=45)).strftime('%Y-%m-%d') + "T00:00:00.000Z"
-    except: pass
-
-    customers_list = []
-    if not info_df.empty:
-        header_r = -1
-        col_map = {'cust': -1, 'name': -1, 'date': -1, 'code': -1}
-        for r in range(info_df.shape[0]):
-            row_str = " ".join([str(x) for x in info_df.iloc[r, :]]).upper()
-            if "CUSTOMER" in row_str and ("CSR" in row_str or "TITLE" in row_str):
-                header_r = r
-                for c in range(info_df.shape[1]):
-                    val = str(info_df.iloc[r, c]).strip().upper()
-                    if "CUSTOMER" in val or "客户" in val: col_map['cust'] = c
-                    elif "CSR" in val or "TITLE" in val: col_map['name'] = c
-                    elif "VERSION" in val or "DATE" in val or "版本" in val or "日期" in val: col_map['date'] = c
-                    elif "供应商代码" in val or "SUPPLIER" in val or "CODE" in val: col_map['code'] = c
-                break
-                
-        if header_r != -1:
-            for r in range(header_r + 1, info_df.shape[0]):
-                cust_val = str(info_df.iloc[r, col_map['cust']]).strip() if col_map['cust'] != -1 else ""
-                if not cust_val or cust_val.lower() == 'nan': continue
-                if "审核员" in cust_val or "AUDIT" in cust_val.upper() or "NAME" in cust_val.upper(): break
-                    
-                name_val = str(info_df.iloc[r, col_map['name']]).strip() if col_map['name'] != -1 else ""
-                date_val = str(info_df.iloc[r, col_map['date']]).strip() if col_map['date'] != -1 else ""
-                code_val = str(info_df.iloc[r, col_map['code']]).strip() if col_map['code'] != -1 else ""
-                
-                final_date = date_val.replace(" 00:00:00", "").strip()
-                customers_list.append({
-                    "Name": cust_val, "SupplierCode": code_val, "NameCSRDocument": name_val, "DateCSRDocument": final_date
-                })
-
-    if not customers_list:
-        customer_name = find_val_by_key(db_df, ["顾客", "客户名称"]) or get_db_val(29, 1)
-        supplier_code = find_val_by_key(db_df, ["供应商编码", "供应商代码"]) or get_db_val(30, 1)
-        csr_name = find_val_by_key(db_df, ["CSR文件名称"]) or get_db_val(31, 1)
-        csr_date_raw = find_val_by_key(db_df, ["CSR文件日期"]) or get_db_val(32, 1)
-        csr_date = str(csr_date_raw).replace(" 00:00:00", "").strip()
-        if csr_date.lower() == 'nan': csr_date = ""
-        if customer_name or supplier_code or csr_name:
-            customers_list.append({
-                "Name": customer_name, "SupplierCode": supplier_code, "NameCSRDocument": csr_name, "DateCSRDocument": csr_date
-            })
-
-    english_address = ""
-    native_street = ""
-    cands = []
-    if not db_df.empty:
-        for r_idx in range(9, 14):
-            if r_idx < db_df.shape[0]:
-                if 1 < db_df.shape[1]: cands.append(str(db_df.iloc[r_idx, 1]))
-                if 4 < db_df.shape[1]: cands.append(str(db_df.iloc[r_idx, 4]))
-                
-    def get_anchored(df, keywords):
-        res = []
-        if df.empty: return res
-        for r in range(df.shape[0]):
-            for c in range(df.shape[1]):
-                val = str(df.iloc[r, c]).strip().upper()
-                if any(k in val for k in keywords):
-                    res.append(str(df.iloc[r, c])) 
-                    if c + 1 < df.shape[1]: res.append(str(df.iloc[r, c+1]))
-                    if c + 2 < df.shape[1]: res.append(str(df.iloc[r, c+2]))
-                    if r + 1 < df.shape[0]: res.append(str(df.iloc[r+1, c]))
-                    if r + 1 < df.shape[0] and c+1 < df.shape[1]: res.append(str(df.iloc[r+1, c+1]))
-        return res
-        
-    cands += get_anchored(info_df, ["审核地址", "AUDIT ADDRESS", "ADDRESS"])
-    cands += get_anchored(db_df, ["地址", "ADDRESS"])
-    
-    en_parts, zh_parts = [] , []
-    for cand in cands:
-        cand = str(cand).strip()
-        if not cand or cand.lower() == 'nan': continue
-        cand = re.sub(r'^(审核地址|组织地址|企业地址|地址|现场地址|AUDIT ADDRESS|ADDRESS)[\s:：]*', '', cand, flags=re.IGNORECASE).strip()
-        if not cand: continue
-        
-        lines = cand.replace('\r', '\n').split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            
-            has_zh = bool(re.search(r'[\u4e00-\u9fff]', line))
-            has_en = bool(re.search(r'[a-zA-Z]{3,}', line)) 
-            
-            if has_zh and has_en:
-                en_str = re.sub(r'[\u4e00-\u9fff]', ' ', line)
-                en_str = re.sub(r'[，。；（）]', ' ', en_str) 
-                en_str = re.sub(r'\s+', ' ', en_str).strip(" ()-.,")
-                zh_str = re.sub(r'[a-zA-Z]', '', line)
-                zh_str = re.sub(r'\s+', ' ', zh_str).strip(" ()-.,")
-                
-                if len(en_str) > 10: en_parts.append(en_str)
-                if len(zh_str) > 5: zh_parts.append(zh_str)
-            elif has_zh: zh_parts.append(line)
-            elif has_en: en_parts.append(line)
-
-    english_address = max(en_parts, key=len) if en_parts else ""
-    native_street = max(zh_parts, key=len) if zh_parts else ""
-
-    en_street, en_city, en_state, en_country = english_address, "", "", ""
-    if english_address:
-        clean_eng = english_address.replace('，', ',')
-        parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
-        if len(parts) >= 3:
-            en_country = parts[-1]
-            en_state = parts[-2]
-            en_city = parts[-3]
-            en_street = ", ".join(parts[:-3])
-        else:
-            en_street = english_address
-
-    final_json["uuid"] = str(uuid.uuid4())
-    final_json["created"] = int(time.time() * 1000)
-
-    # 💥💥💥 [数据保护：条件覆盖写入，不再用空字符串擦除底座数据] 💥💥💥
-    ensure_path(final_json, ["AuditData", "AuditDate"])
-    if start_iso: final_json["AuditData"]["AuditDate"]["Start"] = start_iso
-    if end_iso: final_json["AuditData"]["AuditDate"]["End"] = end_iso
-    
-    cb_id = find_val_by_key(db_df, ["认证机构标识号"]) or get_db_val(2, 4)
-    if cb_id: final_json["AuditData"]["CbIdentificationNo"] = cb_id
-    
-    if raw_name:
-        final_json["AuditData"]["AuditorName"] = raw_name
-        final_json["AuditData"]["auditorname"] = raw_name
-
-    if "AuditTeam" not in final_json["AuditData"] or not isinstance(final_json["AuditData"]["AuditTeam"], list) or len(final_json["AuditData"]["AuditTeam"]) == 0:
-        final_json["AuditData"]["AuditTeam"] = [{}]
-        
-    team = final_json["AuditData"]["AuditTeam"][0]
-    if isinstance(team, dict):
-        if formatted_team_name: team["Name"] = formatted_team_name
-        if caa_no: team["CaaNo"] = caa_no
-        if auditor_id: team["AuditorId"] = auditor_id
-        team["AuditDaysPerformed"] = 1.5
-        team["DatesOnSite"] = [{"Date": start_iso, "Day": 1}, {"Date": end_iso, "Day": 0.5}]
-
-    ensure_path(final_json, ["OrganizationInformation", "AddressNative"])
-    ensure_path(final_json, ["OrganizationInformation", "Address"])
-    org = final_json["OrganizationInformation"]
-    
-    # [数据保护] 只有非空才会写入
-    org_name = find_val_by_key(db_df, ["组织名称"]) or get_db_val(1, 4)
-    if org_name: org["OrganizationName"] = org_name
-    
-    ind_code = find_val_by_key(db_df, ["行业代码", "Industry Code"])
-    if ind_code: org["IndustryCode"] = ind_code
-    
-    usi = find_val_by_key(db_df, ["IATF USI", "USI"]) or get_db_val(3, 4)
-    if usi: org["IATF_USI"] = usi
-    
-    emp_total = find_val_by_key(db_df, ["包括扩展现场在内的员工总数", "员工总数"]) or get_db_val(27, 1)
-    if emp_total: org["TotalNumberEmployees"] = emp_total
-    
-    cert_scope = find_val_by_key(db_df, ["证书范围"])
-    if cert_scope: org["CertificateScope"] = cert_scope
-    
-    rep = find_val_by_key(db_df, ["组织代表", "管理者代表", "联系人", "Representative"]) or get_db_val(15, 1)
-    if rep: org["Representative"] = rep
-    
-    tel = find_val_by_key(db_df, ["联系电话", "电话", "Telephone"]) or get_db_val(15, 4)
-    if tel: org["Telephone"] = tel
-    
-    email = find_val_by_key(db_df, ["电子邮箱", "邮箱", "Email", "E-mail"]) or get_db_val(16, 1)
-    if email and str(email).strip() != "0": org["Email"] = email
-    
-    # 组织主地址条件写入保护
-    if native_street:
-        native_p, native_c, native_s = parse_chinese_address(native_street)
-        if native_p: org["AddressNative"]["State"] = native_p
-        if native_c: org["AddressNative"]["City"] = native_c
-        if native_s: org["AddressNative"]["Street1"] = native_s
-    org["AddressNative"]["Country"] = "中国"
-    
-    if english_address:
-        if en_state: org["Address"]["State"] = en_state
-        if en_city: org["Address"]["City"] = en_city
-        if en_country: org["Address"]["Country"] = en_country
-        if en_street: org["Address"]["Street1"] = en_street
-        
-    postal_code = find_val_by_key(db_df, ["邮政编码"]) or get_db_val(10, 4)
-    if postal_code:
-        org["AddressNative"]["PostalCode"] = postal_code
-        org["Address"]["PostalCode"] = postal_code
-
-    if "全量综合模式" in mode:
-        ems_sites = extract_ems_sites(info_df)
-        if ems_sites:
-            final_json["ExtendedManufacturingSites"] = ems_sites
-            org["ExtendedManufacturingSite"] = "1"
-        else:
-            org["ExtendedManufacturingSite"] = "0"
-            
-        support_sites = extract_rl_sites(info_df)
-        if support_sites:
-            final_json["ProvidingSupportSites"] = support_sites
-            
-        receiving_sites = extract_receiving_sites(info_df)
-        if receiving_sites:
-            final_json["ReceivingSupportSites"] = receiving_sites
-            
-    elif "EMS" in mode:
-        ems_sites = extract_ems_sites(info_df)
-        if ems_sites:
-            final_json["ExtendedManufacturingSites"] = ems_sites
-            org["ExtendedManufacturingSite"] = "1"
-        else:
-            org["ExtendedManufacturingSite"] = "0"
-            
-    elif "RL" in mode:
-        org["ExtendedManufacturingSite"] = "0"
-        support_sites = extract_rl_sites(info_df)
-        if support_sites:
-            final_json["ProvidingSupportSites"] = support_sites
-            
-    else:
-        org["ExtendedManufacturingSite"] = "0"
-
-    # [数据保护] 只有获取到客户数据才重写，没有则保留底座原样
-    ensure_path(final_json, ["CustomerInformation"])
-    if customers_list:
-        final_json["CustomerInformation"]["Customers"] = []
-        for c_info in customers_list:
-            cust_obj = {
-                "Id": str(uuid.uuid4()), "Name": c_info["Name"], "SupplierCode": c_info["SupplierCode"],
-                "Csrs": [{"Id": str(uuid.uuid4()), "Name": c_info["Name"], "SupplierCode": c_info["SupplierCode"],
-                          "NameCSRDocument": c_info["NameCSRDocument"], "DateCSRDocument": c_info["DateCSRDocument"]}]
-            }
-            final_json["CustomerInformation"]["Customers"].append(cust_obj)
-
-    doc_map = {}
-    if not doc_list_df.empty:
-        clause_col = -1
-        doc_col = -1
-        header_r = -1
-        for r in range(min(10, doc_list_df.shape[0])):
-            for c in range(doc_list_df.shape[1]):
-                val = str(doc_list_df.iloc[r, c]).strip()
-                if "条款" in val or "标准条款" in val:
-                    clause_col = c
-                if "公司内对应的程序文件" in val or "包含名称" in val or "文件名称" in val:
-                    doc_col = c
-            if clause_col != -1 and doc_col != -1:
-                header_r = r
-                break
-        
-        if header_r != -1:
-            for r in range(header_r + 1, doc_list_df.shape[0]):
-                clause_val = str(doc_list_df.iloc[r, clause_col]).strip()
-                if not clause_val or clause_val.lower() == 'nan': continue
-                
-                match = re.match(r'^([\d\.]+)', clause_val)
-                if match:
-                    clause_no = match.group(1)
-                    if clause_no.endswith('.'): clause_no = clause_no[:-1]
-                    
-                    doc_parts = []
-                    for dc in range(doc_col, min(doc_col + 3, doc_list_df.shape[1])):
-                        part_val = str(doc_list_df.iloc[r, dc]).strip()
-                        if part_val and part_val.lower() != 'nan':
-                            doc_parts.append(part_val)
-                    
-                    if doc_parts:
-                        doc_map[clause_no] = " ".join(doc_parts)
-
-    if doc_map and "Stage1DocumentedRequirements" in final_json and "IatfClauseDocuments" in final_json["Stage1DocumentedRequirements"]:
-        clause_docs = final_json["Stage1DocumentedRequirements"]["IatfClauseDocuments"]
-        for i in range(len(clause_docs)):
-            if isinstance(clause_docs[i], dict):
-                p_no = str(clause_docs[i].get("ProcessNo", ""))
-                if p_no in doc_map:
-                    clause_docs[i]["DocumentName"] = doc_map[p_no]
-
-    # 💥💥💥 [核心数据保护区：过程数据深度融合 (Deep Merge)] 💥💥💥
-    total_kpis_mapped = 0
-    if not proc_df.empty:
-        processes_list = []
-        base_processes = final_json.get("Processes", [])
-        
-        # 建立底座中现有过程的映射字典，以便继承隐藏参数
-        base_proc_map = {}
-        for bp in base_processes:
-            if isinstance(bp, dict):
-                name = bp.get("ProcessName", "")
-                if name:
-                    base_proc_map[re.sub(r'\s+', '', name)] = bp
-                    
-        clause_cols = proc_df.columns[13:] if proc_df.shape[1] > 13 else []
-        for idx, row in proc_df.iterrows():
-            p_name = str(row.iloc[0]).strip()
-            rep_name = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ""
-            if not p_name or p_name.lower() == 'nan': continue
-            
-            clean_p_name = re.sub(r'\s+', '', p_name)
-            
-            # 1. 尝试从底座模板中寻找该过程，完美继承底座属性
-            proc_obj = base_proc_map.get(clean_p_name)
-            
-            # 如果名字有细微差异，尝试模糊匹配
-            if not proc_obj:
-                for k, v in base_proc_map.items():
-                    if clean_p_name in k or k in clean_p_name:
-                        proc_obj = v
-                        break
-            
-            # 2. 如果底座里真的没有这个过程，才创建全新的
-            if not proc_obj:
-                proc_obj = {
-                    "Id": str(uuid.uuid4()), "ProcessName": p_name,
-                    "ManufacturingProcess": "0", "OnSiteProcess": "1", "RemoteProcess": "0",
-                    "AuditNotes": [], "ProcessPerformance": []
-                }
-            else:
-                proc_obj["ProcessName"] = p_name # 名字对齐到Excel
-                
-            if rep_name: proc_obj["RepresentativeName"] = rep_name
-            
-            # 审核员信息挂载
-            if "AuditNotes" not in proc_obj: proc_obj["AuditNotes"] = []
-            if len(proc_obj["AuditNotes"]) == 0:
-                proc_obj["AuditNotes"].append({"Id": str(uuid.uuid4())})
-            if auditor_id: proc_obj["AuditNotes"][0]["AuditorId"] = auditor_id
-            if raw_name: proc_obj["AuditNotes"][0]["AuditorName"] = raw_name
-            
-            # 3. 将新的 KPI 注入到继承来的过程对象中
-            for k, v_list in kpi_map.items():
-                clean_k = re.sub(r'\s+', '', k)
-                if clean_p_name == clean_k or clean_k in clean_p_name or clean_p_name in clean_k:
-                    proc_obj["ProcessPerformance"] = copy.deepcopy(v_list)
-                    total_kpis_mapped += len(v_list)
-                    break
-            
-            # 4. 更新条款打 X 状态
-            for col in clause_cols:
-                if str(row[col]).strip().upper() in ['X', 'TRUE']: proc_obj[col] = True
-                
-            processes_list.append(proc_obj)
-            
-        # 保护性写入：仅将Excel里列出的过程写回 JSON，且均包含继承来的底层数据
-        if processes_list:
-            final_json["Processes"] = processes_list
-
-    # 报告最终信息写入
-    if "Results" not in final_json: final_json["Results"] = {}
-    if "AuditReportFinal" not in final_json["Results"]: final_json["Results"]["AuditReportFinal"] = {}
-    if end_iso: final_json["Results"]["AuditReportFinal"]["Date"] = end_iso
-    if next_audit_iso: final_json["Results"]["DateNextScheduledAudit"] = next_audit_iso
-    
-    b6_raw_val = get_db_val(5, 1)
-    b6_formatted_name = extract_and_format_english_name(b6_raw_val)
-    if b6_formatted_name: final_json["Results"]["AuditReportFinal"]["AuditorName"] = b6_formatted_name
-
-    return final_json, len(doc_map), total_kpis_mapped
-
-# =====================================================================
-# 主界面展示区
-# =====================================================================
-
-st.title("🛡️ 多模板审计转换引擎 (v70.6.1 地址分离修复版)")
-st.markdown(f"💡 **当前运行模式**: `{run_mode}`")
-
-st.markdown("### 📥 上传数据源")
-uploaded_files = st.file_uploader("支持批量上传 .xlsx 格式文件", type=["xlsx"], accept_multiple_files=True)
-
-if uploaded_files:
-    st.divider()
-    
-    for file in uploaded_files:
-        try:
-            res_json, mapped_doc_count, mapped_kpi_count = generate_json_logic(file, base_template_data, run_mode)
-            st.success(f"✅ 解析成功：{file.name}")
-            
-            row_col1, row_col2 = st.columns([3, 1])
-            
-            with row_col1:
-                with st.expander("👀 查看数据提取日志", expanded=True):
-                     if "全量综合模式" in run_mode:
-                         ems_count = len(res_json.get('ExtendedManufacturingSites', []))
-                         rl_count = len(res_json.get('ProvidingSupportSites', []))
-                         rec_count = len(res_json.get('ReceivingSupportSites', []))
-                         st.code(f"""
-[模块: 全量综合提取]
-✅ EMS扩展场所提取: {ems_count} 个
-✅ RL支持场所提取 : {rl_count} 个
-✅ 被支持场所提取 : {rec_count} 个
-✅ 文件清单精准映射: {mapped_doc_count} 条
-✅ 过程绩效(KPI)分配: {mapped_kpi_count} 条
-标志位(EMS): "{res_json.get('OrganizationInformation', {}).get('ExtendedManufacturingSite', '缺失')}"
-                         """.strip(), language="yaml")
-                         
-                     elif "EMS" in run_mode:
-                         try:
-                             ems_sites = res_json.get('ExtendedManufacturingSites', [])
-                             ems_count = len(ems_sites)
-                             ems_sample = ems_sites[0] if ems_count > 0 else {}
-                         except:
-                             ems_count, ems_sample = 0, {}
-                         st.code(f"""
-[模块: EMS扩展场所]
-提取数量: {ems_count} 个
-场所名称: "{safe_get(ems_sample, 'SiteName', '无')}"
-文件清单映射: {mapped_doc_count} 条
-过程绩效(KPI)分配: {mapped_kpi_count} 条
-标志位: "{res_json.get('OrganizationInformation', {}).get('ExtendedManufacturingSite', '缺失')}"
-                         """.strip(), language="yaml")
-                         
-                     elif "RL" in run_mode:
-                         try:
-                             rl_sites = res_json.get('ProvidingSupportSites', [])
-                             rl_count = len(rl_sites)
-                             rl_sample = rl_sites[0] if rl_count > 0 else {}
-                         except:
-                             rl_count, rl_sample = 0, {}
-                         st.code(f"""
-[模块: RL支持场所]
-提取数量: {rl_count} 个
-场所名称: "{safe_get(rl_sample, 'SiteName', '无')}"
-文件清单映射: {mapped_doc_count} 条
-过程绩效(KPI)分配: {mapped_kpi_count} 条
-                         """.strip(), language="yaml")
-                         
-                     else:
-                         st.code(f"""
-[模块: 纯净标准]
-中文主地址: "{safe_get(res_json.get('OrganizationInformation', {}).get('AddressNative', {}), 'Street1', '缺失')}"
-文件清单映射: {mapped_doc_count} 条目已准确写入
-过程绩效(KPI)分配: {mapped_kpi_count} 条目已精准挂载至相应过程
-                         """.strip(), language="yaml")
-
-            with row_col2:
-                st.download_button(
-                    label=f"📥 下载 JSON 文件",
-                    data=json.dumps(res_json, indent=2, ensure_ascii=False),
-                    file_name=file.name.replace(".xlsx", ".json"),
-                    key=f"dl_{file.name}"
-                )
-        except Exception as e:
-            st.error(f"❌ 解析 {file.name} 失败: {str(e)}")
+import streamlit as st
+import gzip
+import hashlib
+import io
+import json
+import os
+
+from engine import safe_get, make_sheet_pool
+from batch import run_batch, sweep_stale_spools, BatchSpool, JsonlSpool
+from cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB, template_hash
+from snapshot import SnapshotStore
+from pipeline import convert_workbook, convert_workbook_variants
+from budget import ConversionBudget
+from layout import LayoutCache
+from delta import make_delta, apply_delta, apply_delta_lines
+
+# =====================================================================
+# 页面配置
+# =====================================================================
+st.set_page_config(
+    page_title="IATF 审计转换工具 (v70.6.1 地址分离修复版)",
+    page_icon="🛡️",
+    layout="wide"
+)
+
+# =====================================================================
+# 进程级共享资源：所有浏览器会话共用一份（模板、缓存、进程池）
+# =====================================================================
+@st.cache_resource(max_entries=8)
+def load_template(digest, _raw):
+    # 同一份模板在整个服务进程内只解析一次；返回的字典只读，转换时会深拷贝
+    data = json.loads(_raw)
+    return data, template_hash(data)
+
+@st.cache_resource
+def get_conversion_cache():
+    return ConversionCache()
+
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore()
+
+@st.cache_resource
+def get_sheet_pool():
+    return make_sheet_pool()
+
+@st.cache_resource
+def get_layout_cache():
+    return LayoutCache(os.path.join(DEFAULT_CACHE_DIR, "layouts.json"))
+
+# =====================================================================
+# 侧边栏：模板与模式配置
+# =====================================================================
+RUN_MODES = (
+    "纯净标准模式 (无附属场所)", 
+    "单提取：EMS 扩展场所 (F21-M25)", 
+    "单提取：RL 支持场所 (F27-N32)",
+    "全量综合模式 (提取 EMS + RL + 被支持场所)"
+)
+# 下载文件名中区分模式用的短标签
+MODE_TAGS = dict(zip(RUN_MODES, ("standard", "ems", "rl", "full")))
+
+with st.sidebar:
+    st.header("⚙️ 全局配置")
+    st.divider()
+    
+    st.markdown("### 🔍 提取模式选择")
+    run_mode = st.radio("请根据报告类型选择：", RUN_MODES, index=3)
+    all_modes = st.toggle(
+        "一次提取全部模式 (切换模式即时刷新)", value=False,
+        help="上传后一次提取生成四种模式的结果并保留在本会话中，切换模式无需重新转换，可下载其它模式对比（仅逐文件模式）"
+    )
+    st.divider()
+
+    st.markdown("### 🧩 输出内容")
+    output_format = st.radio(
+        "下载 / 落盘内容：",
+        ("完整 JSON 文档", "JSON Patch 增量 (相对底座模板)"),
+        help="增量只包含引擎写入的字段，需配合同一份底座模板还原"
+    )
+    as_patch = "Patch" in output_format
+    st.divider()
+
+    st.markdown("### 📦 批量处理")
+    batch_mode = st.toggle("批量落盘模式 (大批量文件推荐)", value=False)
+    memory_budget_mb = st.number_input(
+        "批次内存增量预算 (MB)", min_value=128, value=1024, step=128, disabled=not batch_mode,
+        help="按本批次开始后服务进程增加的常驻内存计算；超出时先回收内存再继续，不会跳过文件"
+    )
+    batch_format = st.selectbox(
+        "批量输出格式",
+        ("逐文件 JSON", "JSON Lines (.jsonl)", "JSON Lines + gzip (.jsonl.gz)"),
+        disabled=not batch_mode
+    )
+    st.divider()
+
+    st.markdown("### 🗄️ 转换缓存")
+    use_cache = st.toggle("启用持久化转换缓存", value=True)
+    st.caption(f"缓存容量上限: 转换缓存与工作簿快照各 {DEFAULT_CACHE_MAX_MB} MB (全部会话共用，由环境变量 IATF_CACHE_MAX_MB 设置)")
+    use_snapshots = st.toggle("启用工作簿快照 (跳过重复的 Excel 解析)", value=True)
+    parallel_sheets = st.toggle("多进程并行解析工作表 (大文件推荐)", value=False)
+    use_layouts = st.toggle("启用表头布局缓存 (已知模板版本跳过表头扫描)", value=True)
+    st.divider()
+
+    st.markdown("### ⏱️ 单文件预算")
+    use_budget = st.toggle("启用单文件时间/内存预算 (隔离异常工作簿)", value=False)
+    time_budget_s = st.number_input("时间预算 (秒)", min_value=5, value=120, step=5, disabled=not use_budget)
+    file_memory_budget_mb = st.number_input("单文件内存预算 (MB)", min_value=256, value=2048, step=256, disabled=not use_budget)
+    st.divider()
+    
+    st.info("💡 请上传您的 JSON 模板。程序将把该文件作为完整的底层骨架。")
+    user_template_file = st.file_uploader("上传基础 JSON 模板", type=["json"])
+    
+    base_template_data = None
+    if user_template_file:
+        try:
+            raw_template = user_template_file.getvalue()
+            base_template_data, template_digest = load_template(hashlib.sha256(raw_template).hexdigest(), raw_template)
+            st.success(f"✅ 已加载底座: {user_template_file.name}")
+        except Exception as e:
+            st.error(f"❌ 解析失败: {e}")
+            st.stop()
+    else:
+        st.warning("👈 请先上传底座文件以启动程序。")
+        st.stop()
+
+conversion_cache = get_conversion_cache() if use_cache else None
+snapshot_store = get_snapshot_store() if use_snapshots else None
+sheet_pool = get_sheet_pool() if parallel_sheets else None
+layout_cache = get_layout_cache() if use_layouts else None
+conversion_budget = ConversionBudget(time_budget_s, file_memory_budget_mb) if use_budget else None
+
+# =====================================================================
+# 主界面展示区
+# =====================================================================
+
+st.title("🛡️ 多模板审计转换引擎 (v70.6.1 地址分离修复版)")
+st.markdown(f"💡 **当前运行模式**: `{run_mode}`")
+
+st.markdown("### 📥 上传数据源")
+uploaded_files = st.file_uploader("支持批量上传 .xlsx 格式文件", type=["xlsx"], accept_multiple_files=True)
+
+if uploaded_files and batch_mode:
+    st.divider()
+
+    # 批量模式：结果即时落盘，会话中只保留摘要；同一批次的重跑直接复用暂存区
+    batch_key = (
+        template_digest, run_mode, output_format, memory_budget_mb, batch_format, use_cache, use_snapshots, parallel_sheets, use_layouts,
+        use_budget, time_budget_s, file_memory_budget_mb, tuple(f.file_id for f in uploaded_files)
+    )
+    if st.session_state.get("batch_key") == batch_key and not os.path.isdir(st.session_state["batch_dir"]):
+        # 暂存区已被过期清理：重新转换
+        st.session_state["batch_key"] = None
+    if st.session_state.get("batch_key") != batch_key:
+        if st.session_state.get("batch_dir"):
+            BatchSpool(st.session_state["batch_dir"]).cleanup()
+        sweep_stale_spools()
+        progress_bar = st.progress(0.0, text="批量转换中...")
+        spool = JsonlSpool(compress="gzip" in batch_format) if "JSON Lines" in batch_format else BatchSpool()
+        run_batch(
+            uploaded_files, base_template_data, run_mode, memory_budget_mb=memory_budget_mb, spool=spool,
+            cache=conversion_cache, snapshots=snapshot_store, tpl_hash=template_digest,
+            pool=sheet_pool, budget=conversion_budget, layouts=layout_cache, as_patch=as_patch,
+            progress=lambda done, total: progress_bar.progress(done / total, text=f"批量转换中... {done}/{total}")
+        )
+        progress_bar.empty()
+        st.session_state["batch_key"] = batch_key
+        st.session_state["batch_dir"] = spool.out_dir
+        st.session_state["batch_summaries"] = spool.summaries
+        st.session_state["batch_jsonl"] = getattr(spool, "path", None)
+
+    batch_dir = st.session_state["batch_dir"]
+    BatchSpool(batch_dir).touch()
+    summaries = st.session_state["batch_summaries"]
+    ok_items = [s for s in summaries if s["status"] == "ok"]
+    st.success(f"✅ 批量完成：成功 {len(ok_items)} / {len(summaries)} 个，结果暂存于 `{batch_dir}`")
+    for s in summaries:
+        if s["status"] != "ok":
+            st.error(f"❌ 解析 {s['name']} 失败: {s['error']}")
+
+    st.dataframe(
+        [{
+            "文件": s["name"], "状态": s["status"],
+            "EMS": s.get("ems_count"), "RL": s.get("rl_count"), "被支持": s.get("rec_count"),
+            "文件清单": s.get("doc_count"), "KPI": s.get("kpi_count"), "输出路径": s["path"]
+        } for s in summaries]
+    )
+
+    # 下载内容以函数传入，点击下载时才从磁盘读取；页面每次刷新都不会把结果文件读进服务进程内存
+    batch_jsonl = st.session_state.get("batch_jsonl")
+    if ok_items and batch_jsonl:
+        st.download_button(
+            label=f"📥 下载 JSON Lines 批量文件 ({len(ok_items)} 条)",
+            data=lambda path=batch_jsonl: BatchSpool(batch_dir).read_bytes(path),
+            file_name=os.path.basename(batch_jsonl),
+            key="dl_batch_jsonl"
+        )
+    elif ok_items:
+        picked = st.selectbox("选择要下载的结果", ok_items, format_func=lambda s: s["name"])
+        st.download_button(
+            label=f"📥 下载 JSON 文件",
+            data=lambda path=picked["path"]: BatchSpool(batch_dir).read_bytes(path),
+            file_name=picked["name"].replace(".xlsx", ".patch.json" if as_patch else ".json"),
+            key="dl_batch"
+        )
+
+elif uploaded_files:
+    st.divider()
+
+    def output_payload(res_json):
+        if as_patch:
+            return json.dumps(make_delta(base_template_data, res_json, template_digest), indent=2, ensure_ascii=False), ".patch.json"
+        return json.dumps(res_json, indent=2, ensure_ascii=False), ".json"
+
+    # 全部模式：每个文件只提取一次，四种结果留在会话中，切换模式仅重新渲染
+    mode_variants = st.session_state.setdefault("mode_variants", {})
+    live_variants = set()
+    
+    for file in uploaded_files:
+        try:
+            if all_modes:
+                variant_key = (file.file_id, template_digest)
+                live_variants.add(variant_key)
+                if variant_key not in mode_variants:
+                    mode_variants[variant_key] = convert_workbook_variants(
+                        file, base_template_data, RUN_MODES,
+                        cache=conversion_cache, snapshots=snapshot_store, tpl_hash=template_digest,
+                        pool=sheet_pool, budget=conversion_budget, layouts=layout_cache
+                    )
+                res_json, mapped_doc_count, mapped_kpi_count = mode_variants[variant_key][run_mode]
+            else:
+                res_json, mapped_doc_count, mapped_kpi_count = convert_workbook(
+                    file, base_template_data, run_mode,
+                    cache=conversion_cache, snapshots=snapshot_store, tpl_hash=template_digest,
+                    pool=sheet_pool, budget=conversion_budget, layouts=layout_cache
+                )
+            st.success(f"✅ 解析成功：{file.name}")
+            
+            row_col1, row_col2 = st.columns([3, 1])
+            
+            with row_col1:
+                with st.expander("👀 查看数据提取日志", expanded=True):
+                     if "全量综合模式" in run_mode:
+                         ems_count = len(res_json.get('ExtendedManufacturingSites', []))
+                         rl_count = len(res_json.get('ProvidingSupportSites', []))
+                         rec_count = len(res_json.get('ReceivingSupportSites', []))
+                         st.code(f"""
+[模块: 全量综合提取]
+✅ EMS扩展场所提取: {ems_count} 个
+✅ RL支持场所提取 : {rl_count} 个
+✅ 被支持场所提取 : {rec_count} 个
+✅ 文件清单精准映射: {mapped_doc_count} 条
+✅ 过程绩效(KPI)分配: {mapped_kpi_count} 条
+标志位(EMS): "{res_json.get('OrganizationInformation', {}).get('ExtendedManufacturingSite', '缺失')}"
+                         """.strip(), language="yaml")
+                         
+                     elif "EMS" in run_mode:
+                         try:
+                             ems_sites = res_json.get('ExtendedManufacturingSites', [])
+                             ems_count = len(ems_sites)
+                             ems_sample = ems_sites[0] if ems_count > 0 else {}
+                         except:
+                             ems_count, ems_sample = 0, {}
+                         st.code(f"""
+[模块: EMS扩展场所]
+提取数量: {ems_count} 个
+场所名称: "{safe_get(ems_sample, 'SiteName', '无')}"
+文件清单映射: {mapped_doc_count} 条
+过程绩效(KPI)分配: {mapped_kpi_count} 条
+标志位: "{res_json.get('OrganizationInformation', {}).get('ExtendedManufacturingSite', '缺失')}"
+                         """.strip(), language="yaml")
+                         
+                     elif "RL" in run_mode:
+                         try:
+                             rl_sites = res_json.get('ProvidingSupportSites', [])
+                             rl_count = len(rl_sites)
+                             rl_sample = rl_sites[0] if rl_count > 0 else {}
+                         except:
+                             rl_count, rl_sample = 0, {}
+                         st.code(f"""
+[模块: RL支持场所]
+提取数量: {rl_count} 个
+场所名称: "{safe_get(rl_sample, 'SiteName', '无')}"
+文件清单映射: {mapped_doc_count} 条
+过程绩效(KPI)分配: {mapped_kpi_count} 条
+                         """.strip(), language="yaml")
+                         
+                     else:
+                         st.code(f"""
+[模块: 纯净标准]
+中文主地址: "{safe_get(res_json.get('OrganizationInformation', {}).get('AddressNative', {}), 'Street1', '缺失')}"
+文件清单映射: {mapped_doc_count} 条目已准确写入
+过程绩效(KPI)分配: {mapped_kpi_count} 条目已精准挂载至相应过程
+                         """.strip(), language="yaml")
+
+            with row_col2:
+                payload, suffix = output_payload(res_json)
+                st.download_button(
+                    label=f"📥 下载 JSON Patch 增量" if as_patch else f"📥 下载 JSON 文件",
+                    data=payload,
+                    file_name=file.name.replace(".xlsx", suffix),
+                    key=f"dl_{file.name}"
+                )
+                if all_modes:
+                    with st.expander("🔀 其它模式 (对比下载)"):
+                        for other_mode in RUN_MODES:
+                            if other_mode == run_mode: continue
+                            payload, suffix = output_payload(mode_variants[variant_key][other_mode][0])
+                            st.download_button(
+                                label=f"📥 {other_mode.split(' (')[0]}",
+                                data=payload,
+                                file_name=file.name.replace(".xlsx", f"_{MODE_TAGS[other_mode]}{suffix}"),
+                                key=f"dl_{file.name}_{MODE_TAGS[other_mode]}"
+                            )
+        except Exception as e:
+            st.error(f"❌ 解析 {file.name} 失败: {str(e)}")
+
+    # 只保留当前仍在上传列表中的文件结果
+    for stale in set(mode_variants) - live_variants:
+        del mode_variants[stale]
+
+# =====================================================================
+# 增量还原：底座模板 + JSON Patch -> 完整文档
+# =====================================================================
+with st.expander("🧩 从 JSON Patch 增量还原完整文档"):
+    patch_files = st.file_uploader(
+        "上传增量文件 (.patch.json / 批量 .jsonl / .jsonl.gz)，使用当前底座模板还原",
+        type=["json", "jsonl", "gz"], accept_multiple_files=True
+    )
+    for pf in patch_files or []:
+        try:
+            raw = pf.getvalue()
+            if pf.name.endswith(".gz") or pf.name.endswith(".jsonl"):
+                text = gzip.decompress(raw).decode("utf-8") if pf.name.endswith(".gz") else raw.decode("utf-8")
+                rebuilt = "".join(apply_delta_lines(base_template_data, io.StringIO(text), template_digest))
+                out_name = pf.name.replace(".gz", "").replace(".jsonl", ".full.jsonl")
+            else:
+                rebuilt = json.dumps(apply_delta(base_template_data, json.loads(raw), template_digest), indent=2, ensure_ascii=False)
+                out_name = pf.name.replace(".patch.json", ".json") if pf.name.endswith(".patch.json") else pf.name.replace(".json", ".full.json")
+            st.download_button(f"📥 下载还原结果：{out_name}", data=rebuilt, file_name=out_name, key=f"dl_restore_{pf.name}")
+        except Exception as e:
+            st.error(f"❌ 还原 {pf.name} 失败: {e}")
+
+if conversion_cache is not None:
+    cache_stats = conversion_cache.stats()
+    st.caption(
+        f"🗄️ 转换缓存：命中 {cache_stats['hits']} 次 / 未命中 {cache_stats['misses']} 次 · "
+        f"{cache_stats['entries']} 条目 · {cache_stats['bytes'] / (1024 * 1024):.1f} MB"
+    )
+
+if snapshot_store is not None:
+    snapshot_stats = snapshot_store.stats()
+    st.caption(f"📦 工作簿快照：{snapshot_stats['entries']} 个 · {snapshot_stats['bytes'] / (1024 * 1024):.1f} MB")
+
+if layout_cache is not None:
+    layout_stats = layout_cache.stats()
+    st.caption(
+        f"🧭 表头布局缓存：命中 {layout_stats['hits']} 次 / 未命中 {layout_stats['misses']} 次 · "
+        f"已知布局 {layout_stats['layouts']} 种"
+    )
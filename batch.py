@@ -0,0 +1,178 @@
+import gc
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from cache import template_hash
+from delta import make_delta
+from pipeline import convert_workbook
+
+# =====================================================================
+# 批量模式：内存监控
+# =====================================================================
+def current_rss_mb():
+    # Linux 下读取 /proc 获取当前常驻内存；其它平台退化为历史峰值
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return 0.0
+
+def summarize_result(res_json, mapped_doc_count, mapped_kpi_count):
+    # 只保留提取日志中的计数，完整文档随后即可释放
+    org = res_json.get('OrganizationInformation', {})
+    return {
+        "ems_count": len(res_json.get('ExtendedManufacturingSites', [])),
+        "rl_count": len(res_json.get('ProvidingSupportSites', [])),
+        "rec_count": len(res_json.get('ReceivingSupportSites', [])),
+        "doc_count": mapped_doc_count,
+        "kpi_count": mapped_kpi_count,
+        "ems_flag": org.get('ExtendedManufacturingSite', '缺失') if isinstance(org, dict) else '缺失',
+    }
+
+# =====================================================================
+# 批量模式：结果落盘暂存区
+# =====================================================================
+SPOOL_PREFIX = "iatf_batch_"
+# 暂存区保留时长：会话仍在使用的暂存区每次刷新页面都会续期
+SPOOL_TTL_S = 24 * 3600
+
+def sweep_stale_spools(max_age_s=SPOOL_TTL_S, root=None):
+    # 会话关闭后，它最后一个批次的暂存区无人清理；按修改时间删除过期的暂存目录
+    root = root or tempfile.gettempdir()
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for entry in os.scandir(root):
+        if not entry.name.startswith(SPOOL_PREFIX) or not entry.is_dir(follow_symlinks=False): continue
+        try:
+            if entry.stat().st_mtime >= cutoff: continue
+        except OSError:
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed
+
+class BatchSpool:
+    def __init__(self, out_dir=None):
+        self.out_dir = out_dir or tempfile.mkdtemp(prefix=SPOOL_PREFIX)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.summaries = []
+        self._used_names = set()
+
+    def _unique_path(self, source_name):
+        base = os.path.basename(str(source_name)).replace(".xlsx", "") or "output"
+        candidate, n = base, 1
+        while candidate in self._used_names:
+            n += 1
+            candidate = f"{base}_{n}"
+        self._used_names.add(candidate)
+        return os.path.join(self.out_dir, candidate + ".json")
+
+    def write(self, source_name, res_json, mapped_doc_count, mapped_kpi_count, document=None):
+        # document 为实际落盘的内容（如增量补丁），缺省即完整文档；摘要始终按完整文档统计
+        path = self._unique_path(source_name)
+        # json.dump 分块写入文件，避免再构造一份完整的 dumps 字符串
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(res_json if document is None else document, f, indent=2, ensure_ascii=False)
+        summary = {"name": source_name, "status": "ok", "error": "", "path": path}
+        summary.update(summarize_result(res_json, mapped_doc_count, mapped_kpi_count))
+        self.summaries.append(summary)
+        return summary
+
+    def fail(self, source_name, error):
+        summary = {"name": source_name, "status": "error", "error": str(error), "path": ""}
+        self.summaries.append(summary)
+        return summary
+
+    def read_bytes(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+    def touch(self):
+        # 续期：会话仍在展示该批次结果，避免被过期清理
+        try: os.utime(self.out_dir)
+        except OSError: pass
+
+    def cleanup(self):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+# =====================================================================
+# 批量模式：JSON Lines 流式输出（可选 gzip）
+# =====================================================================
+class JsonlSpool(BatchSpool):
+    def __init__(self, out_dir=None, compress=False, file_name="batch"):
+        super().__init__(out_dir)
+        self.path = os.path.join(self.out_dir, file_name + (".jsonl.gz" if compress else ".jsonl"))
+        self._stream = gzip.open(self.path, "at", encoding="utf-8") if compress else open(self.path, "a", encoding="utf-8")
+        self._lines = 0
+
+    def write(self, source_name, res_json, mapped_doc_count, mapped_kpi_count, document=None):
+        counts = summarize_result(res_json, mapped_doc_count, mapped_kpi_count)
+        # 每行一个紧凑文档，信封字段放在前面便于下游按行过滤
+        envelope = {"source": source_name}
+        envelope.update(counts)
+        envelope["document"] = res_json if document is None else document
+        json.dump(envelope, self._stream, ensure_ascii=False, separators=(",", ":"))
+        self._stream.write("\n")
+        self._stream.flush()
+        self._lines += 1
+
+        summary = {"name": source_name, "status": "ok", "error": "", "path": self.path, "line": self._lines}
+        summary.update(counts)
+        self.summaries.append(summary)
+        return summary
+
+    def close(self):
+        if not self._stream.closed: self._stream.close()
+
+    def cleanup(self):
+        self.close()
+        super().cleanup()
+
+# =====================================================================
+# 批量模式：主循环
+# =====================================================================
+def run_batch(files, base_data, mode, memory_budget_mb=1024, spool=None, progress=None,
+              cache=None, snapshots=None, tpl_hash=None, pool=None, budget=None, layouts=None, as_patch=False):
+    spool = spool or BatchSpool()
+    total = len(files)
+    tpl_hash = tpl_hash or template_hash(base_data)
+    gc.collect()
+    baseline_mb = current_rss_mb()
+
+    for i, file in enumerate(files):
+        name = getattr(file, "name", str(file))
+        try:
+            res_json, mapped_doc_count, mapped_kpi_count = convert_workbook(
+                file, base_data, mode, cache=cache, snapshots=snapshots, tpl_hash=tpl_hash, pool=pool, budget=budget, layouts=layouts
+            )
+            document = make_delta(base_data, res_json, tpl_hash) if as_patch else None
+            spool.write(name, res_json, mapped_doc_count, mapped_kpi_count, document=document)
+        except Exception as e:
+            spool.fail(name, e)
+        # 完整文档已落盘，立即释放，内存占用与批量大小无关
+        res_json = document = None
+
+        # 内存预算是回压而非上限：增量超出时先回收再继续，不丢弃任何文件。每个文件都重新判断——
+        # 共享服务的常驻内存含其它会话的工作，释放后也很少回落，不能据此判定本批次失败
+        if memory_budget_mb and current_rss_mb() - baseline_mb > memory_budget_mb:
+            gc.collect()
+        if progress: progress(i + 1, total)
+
+    spool.close()
+    return spool
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# =====================================================================
+# 单文件预算：在子进程中执行转换，超时或超内存即判定该文件失败
+# =====================================================================
+def _vm_size_bytes():
+    # 子进程启动后（已载入 pandas 等模块）的虚拟内存大小，预算在此基础上累加
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _budget_child(conn, memory_budget_mb, fn, args, kwargs):
+    if memory_budget_mb and resource is not None:
+        limit = _vm_size_bytes() + int(memory_budget_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        conn.send(("ok", fn(*args, **kwargs)))
+    except MemoryError:
+        conn.send(("memory", ""))
+    except Exception as e:
+        try:
+            conn.send(("error", e))
+        except Exception:
+            conn.send(("error", RuntimeError(str(e))))
+    finally:
+        conn.close()
+
+def _budget_context(preload):
+    # 不能用 fork：服务进程是多线程的，fork 出的子进程会继承其它会话线程当时持有的锁，永远等不到释放。
+    # 优先 forkserver（服务进程只启动一次并预先导入转换模块，之后每个子进程从它 fork，启动很快），否则 spawn
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([preload])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+class ConversionBudget:
+    # fn 须为模块级函数，参数与返回值须可序列化：子进程是全新的解释器，不共享本进程的任何对象
+    def __init__(self, time_budget_s=120, memory_budget_mb=2048):
+        self.time_budget_s = time_budget_s
+        self.memory_budget_mb = memory_budget_mb
+
+    def run(self, fn, *args, **kwargs):
+        ctx = _budget_context(fn.__module__)
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_budget_child, args=(child_conn, self.memory_budget_mb, fn, args, kwargs), daemon=True)
+        proc.start()
+        child_conn.close()
+        try:
+            if not parent_conn.poll(self.time_budget_s):
+                proc.kill()
+                raise TimeoutError(f"转换超时：超过 {self.time_budget_s} 秒时间预算，已终止")
+            try:
+                status, payload = parent_conn.recv()
+            except EOFError:
+                proc.join()
+                raise MemoryError(f"转换进程异常退出 (exit code {proc.exitcode})，可能超出 {self.memory_budget_mb} MB 内存预算")
+        finally:
+            proc.join(5)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+            parent_conn.close()
+
+        if status == "memory":
+            raise MemoryError(f"转换超出 {self.memory_budget_mb} MB 内存预算，已终止")
+        if status == "error":
+            raise payload
+        return payload
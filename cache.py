@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from engine import ENGINE_VERSION
+
+DEFAULT_CACHE_DIR = os.environ.get("IATF_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "iatf_converter")
+# 缓存容量上限为进程级设置：缓存对象由所有会话共用，不随单个会话的界面选项变化
+DEFAULT_CACHE_MAX_MB = int(os.environ.get("IATF_CACHE_MAX_MB") or 512)
+
+# =====================================================================
+# 缓存键
+# =====================================================================
+def template_hash(base_data):
+    canonical = json.dumps(base_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def conversion_key(workbook_bytes, tpl_hash, mode, engine_version=ENGINE_VERSION):
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(workbook_bytes).digest())
+    for part in (tpl_hash, mode, engine_version):
+        h.update(b"\0")
+        h.update(str(part).encode("utf-8"))
+    return h.hexdigest()
+
+@contextmanager
+def exclusive_dir(root, thread_lock):
+    # 进程内用线程锁，跨进程用 root/.lock 上的 flock；Windows 下退化为仅线程锁
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(root, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# =====================================================================
+# 持久化转换缓存：内容寻址 + 按大小 LRU 淘汰
+# =====================================================================
+class ConversionCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "conversions")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def _exclusive(self):
+        return exclusive_dir(self.root, self._lock)
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # 命中即刷新修改时间，作为 LRU 的访问顺序
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock: self.misses += 1
+            return None
+        with self._lock: self.hits += 1
+        return entry["result"], entry["doc_count"], entry["kpi_count"]
+
+    def put(self, key, res_json, mapped_doc_count, mapped_kpi_count):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"doc_count": mapped_doc_count, "kpi_count": mapped_kpi_count, "result": res_json}
+        # 先写临时文件再原子替换，并发读者只会看到完整条目或看不到
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for sub in os.scandir(self.root):
+            if not sub.is_dir(): continue
+            for item in os.scandir(sub.path):
+                if not item.name.endswith(".json"): continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+        return entries
+
+    def evict(self):
+        with self._exclusive():
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes: return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes: break
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
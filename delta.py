@@ -0,0 +1,153 @@
+import copy
+import json
+
+from engine import ENGINE_VERSION, OUTPUT_FIELDS
+from cache import template_hash
+
+# 增量格式版本：信封结构变化时递增
+DELTA_FORMAT = "iatf-json-patch/1"
+
+# =====================================================================
+# JSON Pointer (RFC 6901)
+# =====================================================================
+def _pointer(path):
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in path)
+
+def _unpointer(pointer):
+    if not pointer: return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"非法 JSON Pointer: {pointer}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+def _same(a, b):
+    # 严格相等：json 中 1 / 1.0 / true 是不同的值，Python 的 == 会把它们视为相等
+    if type(a) is not type(b): return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+# =====================================================================
+# 生成增量：只遍历引擎写入的字段，不做整树比对
+# =====================================================================
+def _expand(doc, path):
+    # 将路径中的 "*" 按文档中对应数组的长度展开
+    if "*" not in path:
+        yield tuple(path)
+        return
+    i = path.index("*")
+    node = doc
+    for key in path[:i]:
+        if isinstance(node, dict) and key in node: node = node[key]
+        elif isinstance(node, list) and isinstance(key, int) and key < len(node): node = node[key]
+        else: return
+    if not isinstance(node, list): return
+    for n in range(len(node)):
+        yield from _expand(doc, path[:i] + (n,) + path[i + 1:])
+
+def _field_op(base, doc, path):
+    b, d = base, doc
+    for i, key in enumerate(path):
+        if isinstance(d, dict) and isinstance(key, str):
+            if key not in d: return None
+            if not isinstance(b, dict):
+                return {"op": "replace", "path": _pointer(path[:i]), "value": d}
+            if key not in b:
+                return {"op": "add", "path": _pointer(path[:i + 1]), "value": d[key]}
+        elif isinstance(d, list) and isinstance(key, int):
+            if key >= len(d): return None
+            # 数组按下标 add 是插入而非覆盖，底座缺少该元素时整体替换数组
+            if not isinstance(b, list) or key >= len(b):
+                return {"op": "replace", "path": _pointer(path[:i]), "value": d}
+        else:
+            return None
+        b, d = b[key], d[key]
+    if _same(b, d): return None
+    return {"op": "replace", "path": _pointer(path), "value": d}
+
+def make_patch(base_data, result):
+    ops, covered = [], []
+    for field in OUTPUT_FIELDS:
+        for path in _expand(result, field):
+            op = _field_op(base_data, result, path)
+            if op is None: continue
+            # 父级容器已整体写入时，其下的字段无需再单独记录
+            if any(op["path"] == c or op["path"].startswith(c + "/") for c in covered): continue
+            ops.append(op)
+            covered.append(op["path"])
+    return ops
+
+def make_delta(base_data, result, tpl_hash=None):
+    return {
+        "format": DELTA_FORMAT,
+        "base_template": tpl_hash or template_hash(base_data),
+        "engine_version": ENGINE_VERSION,
+        "patch": make_patch(base_data, result),
+    }
+
+def is_delta(obj):
+    return isinstance(obj, dict) and obj.get("format") == DELTA_FORMAT
+
+# =====================================================================
+# 应用增量：模板 + 补丁 还原完整文档
+# =====================================================================
+def _child_key(container, token, op):
+    if isinstance(container, dict): return token
+    if isinstance(container, list):
+        if token == "-" and op == "add": return len(container)
+        if not token.isdigit():
+            raise ValueError(f"数组下标非法: {token}")
+        index = int(token)
+        if index > len(container) or (index == len(container) and op != "add"):
+            raise ValueError(f"数组下标越界: {token}")
+        return index
+    raise ValueError(f"路径穿过非容器节点: {token}")
+
+def apply_patch(doc, patch):
+    # 支持 RFC 6902 的 add / replace / remove；返回新文档，不修改入参
+    doc = copy.deepcopy(doc)
+    for op in patch:
+        name, tokens = op["op"], _unpointer(op["path"])
+        if not tokens:
+            if name == "remove": raise ValueError("不能删除文档根节点")
+            doc = copy.deepcopy(op["value"])
+            continue
+        parent = doc
+        for token in tokens[:-1]:
+            key = _child_key(parent, token, "replace")
+            if isinstance(parent, dict) and key not in parent:
+                raise ValueError(f"路径不存在: {op['path']}")
+            parent = parent[key]
+        key = _child_key(parent, tokens[-1], name)
+
+        if name == "add":
+            if isinstance(parent, list): parent.insert(key, copy.deepcopy(op["value"]))
+            else: parent[key] = copy.deepcopy(op["value"])
+        elif name in ("replace", "remove"):
+            if isinstance(parent, dict) and key not in parent:
+                raise ValueError(f"路径不存在: {op['path']}")
+            if name == "replace": parent[key] = copy.deepcopy(op["value"])
+            else: del parent[key]
+        else:
+            raise ValueError(f"不支持的补丁操作: {name}")
+    return doc
+
+def apply_delta(base_data, delta, tpl_hash=None):
+    if not is_delta(delta):
+        raise ValueError("不是有效的增量文件 (缺少 format 标记)")
+    expected = delta.get("base_template")
+    actual = tpl_hash or template_hash(base_data)
+    if expected != actual:
+        raise ValueError(f"底座模板不匹配：增量基于 {str(expected)[:12]}…，当前模板为 {actual[:12]}…")
+    return apply_patch(base_data, delta["patch"])
+
+def apply_delta_lines(base_data, lines, tpl_hash=None):
+    # 逐行还原批量 JSON Lines：信封中的增量替换为完整文档，其余字段原样保留
+    tpl_hash = tpl_hash or template_hash(base_data)
+    for line in lines:
+        if not line.strip(): continue
+        envelope = json.loads(line)
+        if is_delta(envelope.get("document")):
+            envelope["document"] = apply_delta(base_data, envelope["document"], tpl_hash)
+        yield json.dumps(envelope, ensure_ascii=False, separators=(",", ":")) + "\n"
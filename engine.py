@@ -0,0 +1,1062 @@
+import pandas as pd
+import numpy as np
+import io
+import os
+import multiprocessing
+import threading
+import uuid
+import time
+import copy
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import patterns as P
+
+# 引擎版本：提取逻辑变化时递增，缓存键随之失效
+ENGINE_VERSION = "v70.6.3"
+
+# =====================================================================
+# 通用辅助函数区
+# =====================================================================
+def source_bytes(excel_file):
+    # 统一获取上传文件 / 文件对象 / 路径的原始字节，不改变文件对象的读取位置
+    if isinstance(excel_file, (bytes, bytearray)):
+        return bytes(excel_file)
+    if hasattr(excel_file, "getvalue"):
+        return excel_file.getvalue()
+    if hasattr(excel_file, "read"):
+        pos = excel_file.tell()
+        data = excel_file.read()
+        excel_file.seek(pos)
+        return data
+    with open(excel_file, "rb") as f:
+        return f.read()
+
+def collect_ids(node, ids):
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == "Id" and isinstance(v, str): ids.add(v)
+            else: collect_ids(v, ids)
+    elif isinstance(node, list):
+        for v in node: collect_ids(v, ids)
+    return ids
+
+def renew_ids(node, keep, renamed):
+    # 同一个旧 Id 映射到同一个新 Id，保持文档内部引用一致
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == "Id" and isinstance(v, str):
+                if v not in keep: node[k] = renamed.setdefault(v, str(uuid.uuid4()))
+            else: renew_ids(v, keep, renamed)
+    elif isinstance(node, list):
+        for v in node: renew_ids(v, keep, renamed)
+
+def ensure_path(d, path):
+    current = d
+    for key in path:
+        if key not in current or not isinstance(current[key], dict):
+            current[key] = {}
+        current = current[key]
+    return current
+
+def safe_get(obj, key, default=""):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return default
+
+def extract_and_format_english_name(raw_val):
+    clean_val = str(raw_val).replace("姓名:", "").replace("Name:", "").strip()
+    if not clean_val: return ""
+    eng_only = P.NON_LATIN.sub(' ', clean_val).strip()
+    eng_only = P.WHITESPACE.sub(' ', eng_only)
+    if eng_only:
+        parts = eng_only.split()
+        if len(parts) >= 2 and parts[0].isupper() and not parts[1].isupper():
+            return f"{parts[1]} {parts[0]}"
+        else:
+            return eng_only
+    return clean_val
+
+# 💥 唯一修改点：深度优化的地址解析函数 💥
+# 结果按地址字符串缓存，整个服务进程（所有会话、所有工作簿）共用
+@lru_cache(maxsize=4096)
+def parse_chinese_address(addr_str):
+    province, city, street = "", "", addr_str
+    if not addr_str: return province, city, street
+
+    # 预处理：移除开头可能的“中国”
+    clean_addr = P.CN_COUNTRY_PREFIX.sub('', str(addr_str)).strip()
+    
+    # 1. 提取省份/直辖市
+    p_match = P.CN_PROVINCE.search(clean_addr)
+    
+    if p_match:
+        province = p_match.group(1).strip()
+        if province in ["北京", "上海", "天津", "重庆"]:
+            province += "市"
+        clean_addr = clean_addr[len(p_match.group(1)):].strip()
+    
+    # 2. 提取城市 (独立于省份运行，并移除单独的"州"匹配，防止荆州市被拆断)
+    c_match = P.CN_CITY.search(clean_addr)
+    
+    if c_match:
+        city = c_match.group(1).strip()
+        street = clean_addr[len(city):].strip()
+    else:
+        # 处理直辖市
+        if province and any(x in province for x in ["北京", "上海", "天津", "重庆"]):
+            city = province
+            street = clean_addr
+        else:
+            city = ""
+            street = clean_addr
+
+    return province, city, street
+
+# =====================================================================
+# 表头布局识别区：各区块的表头判定与完整扫描
+# =====================================================================
+# 每个区块提供 discover_*_layout(df) 完整扫描，以及扫描范围 window = (起始行, 结束行, 起始列, 结束列)；
+# 布局缓存按表头区域内容命中，命中时跳过扫描。
+def find_layout(layouts, section, df, window, header_at, discover):
+    # header_at(df, r)：只读第 r 行判定表头并给出列映射；discover(df)：窗口内完整扫描
+    if layouts is None: return discover(df)
+    return layouts.resolve(section, df, window, header_at, discover)
+
+# 场所区块的表头搜索窗口：(起始行, 结束行, 起始列, 结束列)
+SITE_WINDOWS = {"ems": (20, 25, 5, 13), "rl": (26, 32, 5, 14), "rec": (33, 38, 5, 14)}
+
+def _is_site_header(section, val):
+    if section == "ems": return "EMS扩展场所信息" in val or "扩展制造场所" in val or "扩展现场" in val
+    if section == "rl": return ("支持场所" in val or "RL" in val) and "被" not in val
+    return "被支持场所" in val
+
+def _site_header_at(section, info_df, r):
+    _, _, col_start, col_end = SITE_WINDOWS[section]
+    col_end = min(col_end, info_df.shape[1])
+    if not any(_is_site_header(section, str(info_df.iloc[r, c]).strip().upper()) for c in range(col_start, col_end)):
+        return None
+    col_map = {}
+    for c_scan in range(col_start, col_end):
+        h_val = str(info_df.iloc[r, c_scan]).strip()
+        if "中文名称" in h_val: col_map['name_cn'] = c_scan
+        elif "英文名称" in h_val: col_map['name_en'] = c_scan
+        elif "中文地址" in h_val: col_map['addr_cn'] = c_scan
+        elif "英文地址" in h_val: col_map['addr_en'] = c_scan
+        elif "邮编" in h_val or "邮政编码" in h_val: col_map['zip'] = c_scan
+        elif "USI" in h_val.upper(): col_map['usi'] = c_scan
+        elif "人数" in h_val: col_map['emp'] = c_scan
+        elif section != "ems" and "支持功能" in h_val: col_map['func'] = c_scan
+    return col_map
+
+def discover_site_layout(section, info_df):
+    row_start, row_end, _, _ = SITE_WINDOWS[section]
+    for r in range(row_start, min(row_end, info_df.shape[0])):
+        col_map = _site_header_at(section, info_df, r)
+        if col_map is not None: return r, col_map
+    return -1, {}
+
+def site_layout(info_df, section, layouts=None):
+    return find_layout(
+        layouts, section, info_df, SITE_WINDOWS[section],
+        lambda df, r: _site_header_at(section, df, r), lambda df: discover_site_layout(section, df)
+    )
+
+# 过程绩效：前 10 行内寻找 "过程" / "KPI名称" 表头
+PERF_WINDOW = (0, 10, 0, None)
+
+def _perf_header_at(perf_df, r):
+    if not any(str(perf_df.iloc[r, c]).strip().upper() == "过程" or "KPI名称" in str(perf_df.iloc[r, c]).strip().upper() for c in range(perf_df.shape[1])):
+        return None
+    col_map = {'proc': -1, 'kpi': -1, 'target': -1, 'result': -1, 'trend': -1}
+    for scan_c in range(perf_df.shape[1]):
+        h_val = str(perf_df.iloc[r, scan_c]).strip().upper()
+        if ("过程" == h_val or "PROCESS" in h_val) and col_map['proc'] == -1: 
+            col_map['proc'] = scan_c
+        elif ("KPI" in h_val or "指标" in h_val) and col_map['kpi'] == -1: 
+            col_map['kpi'] = scan_c
+        elif ("目标" in h_val or "TARGET" in h_val) and col_map['target'] == -1: 
+            col_map['target'] = scan_c
+        elif ("结果" in h_val or "RESULT" in h_val) and col_map['result'] == -1: 
+            col_map['result'] = scan_c
+        elif ("趋势" in h_val or "TREND" in h_val) and col_map['trend'] == -1: 
+            col_map['trend'] = scan_c
+    return col_map
+
+def discover_perf_layout(perf_df):
+    for r in range(min(10, perf_df.shape[0])):
+        col_map = _perf_header_at(perf_df, r)
+        if col_map is not None: return r, col_map
+    return -1, {'proc': -1, 'kpi': -1, 'target': -1, 'result': -1, 'trend': -1}
+
+# 信息表客户清单：整表寻找同时含 CUSTOMER 与 CSR/TITLE 的行
+CUSTOMER_WINDOW = (0, None, 0, None)
+
+def _customer_header_at(info_df, r):
+    row_str = " ".join([str(x) for x in info_df.iloc[r, :]]).upper()
+    if not ("CUSTOMER" in row_str and ("CSR" in row_str or "TITLE" in row_str)):
+        return None
+    col_map = {'cust': -1, 'name': -1, 'date': -1, 'code': -1}
+    for c in range(info_df.shape[1]):
+        val = str(info_df.iloc[r, c]).strip().upper()
+        if "CUSTOMER" in val or "客户" in val: col_map['cust'] = c
+        elif "CSR" in val or "TITLE" in val: col_map['name'] = c
+        elif "VERSION" in val or "DATE" in val or "版本" in val or "日期" in val: col_map['date'] = c
+        elif "供应商代码" in val or "SUPPLIER" in val or "CODE" in val: col_map['code'] = c
+    return col_map
+
+def discover_customer_layout(info_df):
+    for r in range(info_df.shape[0]):
+        col_map = _customer_header_at(info_df, r)
+        if col_map is not None: return r, col_map
+    return -1, {'cust': -1, 'name': -1, 'date': -1, 'code': -1}
+
+# 文件清单：前 10 行内寻找条款列与文件名称列
+DOC_WINDOW = (0, 10, 0, None)
+
+def _doc_scan_row(doc_list_df, r, clause_col=-1, doc_col=-1):
+    for c in range(doc_list_df.shape[1]):
+        val = str(doc_list_df.iloc[r, c]).strip()
+        if "条款" in val or "标准条款" in val:
+            clause_col = c
+        if "公司内对应的程序文件" in val or "包含名称" in val or "文件名称" in val:
+            doc_col = c
+    return clause_col, doc_col
+
+def _doc_header_at(doc_list_df, r):
+    clause_col, doc_col = _doc_scan_row(doc_list_df, r)
+    if clause_col == -1 or doc_col == -1: return None
+    return {'clause': clause_col, 'doc': doc_col}
+
+def discover_doc_layout(doc_list_df):
+    clause_col, doc_col = -1, -1
+    for r in range(min(10, doc_list_df.shape[0])):
+        clause_col, doc_col = _doc_scan_row(doc_list_df, r, clause_col, doc_col)
+        if clause_col != -1 and doc_col != -1:
+            return r, {'clause': clause_col, 'doc': doc_col}
+    return -1, {'clause': -1, 'doc': -1}
+
+# =====================================================================
+# 独立模块 1：EMS 扩展场所提取器
+# =====================================================================
+def extract_ems_sites(info_df, layouts=None):
+    ems_sites = []
+    if info_df.empty: return ems_sites
+    row_end = min(SITE_WINDOWS["ems"][1], info_df.shape[0])
+    header_r, col_map = site_layout(info_df, "ems", layouts)
+            
+    if header_r != -1:
+        for r in range(header_r + 1, row_end):
+            def safe_get_cell(row, col_idx):
+                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
+                v = str(info_df.iloc[row, col_idx]).strip()
+                return "" if v.lower() == 'nan' else v
+
+            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
+            name_en = safe_get_cell(r, col_map.get('name_en', -1))
+            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
+            
+            if not name_cn and not addr_cn: continue
+            if "名称" in name_cn and "地址" in addr_cn: continue
+            
+            full_site_name = name_cn
+            if name_en and name_en not in name_cn:
+                full_site_name = f"{name_cn} {name_en}".strip()
+
+            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
+            zip_code = safe_get_cell(r, col_map.get('zip', -1))
+            usi = safe_get_cell(r, col_map.get('usi', -1))
+            emp = safe_get_cell(r, col_map.get('emp', -1))
+
+            ems_street, ems_city, ems_state, ems_country = addr_en, "", "", ""
+            if addr_en:
+                clean_eng = addr_en.replace('，', ',')
+                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
+                if len(parts) >= 3:
+                    ems_country = parts[-1]
+                    ems_state = parts[-2]
+                    ems_city = parts[-3]
+                    ems_street = ", ".join(parts[:-3])
+                else:
+                    ems_street = addr_en
+
+            ems_zh_p, ems_zh_c, ems_zh_s = parse_chinese_address(addr_cn)
+
+            site_obj = {
+                "Id": str(uuid.uuid4()),
+                "SiteName": full_site_name,
+                "IATF_USI": usi,
+                "Usi": usi,
+                "TotalNumberEmployees": emp,
+                "AddressNative": {"Street1": ems_zh_s, "City": ems_zh_c, "State": ems_zh_p, "Country": "中国", "PostalCode": zip_code},
+                "Address": {"Street1": ems_street, "City": ems_city, "State": ems_state, "Country": ems_country, "PostalCode": zip_code}
+            }
+            ems_sites.append(site_obj)
+    return ems_sites
+
+# =====================================================================
+# 独立模块 2：RL 支持场所提取器
+# =====================================================================
+def extract_rl_sites(info_df, layouts=None):
+    support_sites = []
+    if info_df.empty: return support_sites
+    rl_row_end = min(SITE_WINDOWS["rl"][1], info_df.shape[0])
+    header_r, col_map = site_layout(info_df, "rl", layouts)
+            
+    if header_r != -1:
+        for r in range(header_r + 1, rl_row_end):
+            def safe_get_cell(row, col_idx):
+                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
+                v = str(info_df.iloc[row, col_idx]).strip()
+                return "" if v.lower() == 'nan' else v
+
+            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
+            name_en = safe_get_cell(r, col_map.get('name_en', -1))
+            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
+            
+            if not name_cn and not addr_cn: continue
+            if "名称" in name_cn and "地址" in addr_cn: continue
+            
+            full_site_name = name_cn
+            if name_en and name_en not in name_cn:
+                full_site_name = f"{name_cn} {name_en}".strip()
+
+            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
+            zip_code = safe_get_cell(r, col_map.get('zip', -1))
+            usi = safe_get_cell(r, col_map.get('usi', -1))
+            emp = safe_get_cell(r, col_map.get('emp', -1))
+            func = safe_get_cell(r, col_map.get('func', -1))
+
+            rl_street, rl_city, rl_state, rl_country = addr_en, "", "", ""
+            if addr_en:
+                clean_eng = addr_en.replace('，', ',')
+                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
+                if len(parts) >= 3:
+                    rl_country = parts[-1]
+                    rl_state = parts[-2]
+                    rl_city = parts[-3]
+                    rl_street = ", ".join(parts[:-3])
+                else:
+                    rl_street = addr_en
+
+            rl_zh_p, rl_zh_c, rl_zh_s = parse_chinese_address(addr_cn)
+
+            site_obj = {
+                "Id": str(uuid.uuid4()),
+                "SiteName": full_site_name,
+                "Comments": func,
+                "IATF_USI": usi,
+                "Usi": usi,
+                "TotalNumberEmployees": emp,
+                "AddressNative": {"Street1": rl_zh_s, "City": rl_zh_c, "State": rl_zh_p, "Country": "中国", "PostalCode": zip_code},
+                "Address": {"Street1": rl_street, "City": rl_city, "State": rl_state, "Country": rl_country, "PostalCode": zip_code}
+            }
+            support_sites.append(site_obj)
+    return support_sites
+
+# =====================================================================
+# 独立模块 3：被支持场所提取器
+# =====================================================================
+def extract_receiving_sites(info_df, layouts=None):
+    receiving_sites = []
+    if info_df.empty: return receiving_sites
+    rec_row_end = min(SITE_WINDOWS["rec"][1], info_df.shape[0])
+    header_r, col_map = site_layout(info_df, "rec", layouts)
+            
+    if header_r != -1:
+        for r in range(header_r + 1, rec_row_end):
+            def safe_get_cell(row, col_idx):
+                if col_idx == -1 or col_idx >= info_df.shape[1]: return ""
+                v = str(info_df.iloc[row, col_idx]).strip()
+                return "" if v.lower() == 'nan' else v
+
+            name_cn = safe_get_cell(r, col_map.get('name_cn', -1))
+            name_en = safe_get_cell(r, col_map.get('name_en', -1))
+            addr_cn = safe_get_cell(r, col_map.get('addr_cn', -1))
+            
+            if not name_cn and not addr_cn: continue
+            if "名称" in name_cn and "地址" in addr_cn: continue
+            
+            full_site_name = name_cn
+            if name_en and name_en not in name_cn:
+                full_site_name = f"{name_cn} {name_en}".strip()
+
+            addr_en = safe_get_cell(r, col_map.get('addr_en', -1))
+            zip_code = safe_get_cell(r, col_map.get('zip', -1))
+            usi = safe_get_cell(r, col_map.get('usi', -1))
+            emp = safe_get_cell(r, col_map.get('emp', -1))
+            func = safe_get_cell(r, col_map.get('func', -1))
+
+            rec_street, rec_city, rec_state, rec_country = addr_en, "", "", ""
+            if addr_en:
+                clean_eng = addr_en.replace('，', ',')
+                parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
+                if len(parts) >= 3:
+                    rec_country = parts[-1]
+                    rec_state = parts[-2]
+                    rec_city = parts[-3]
+                    rec_street = ", ".join(parts[:-3])
+                else:
+                    rec_street = addr_en
+
+            rec_zh_p, rec_zh_c, rec_zh_s = parse_chinese_address(addr_cn)
+
+            site_obj = {
+                "Id": str(uuid.uuid4()),
+                "SiteName": full_site_name,
+                "Comments": func,
+                "IATF_USI": usi,
+                "Usi": usi,
+                "TotalNumberEmployees": emp,
+                "AddressNative": {"Street1": rec_zh_s, "City": rec_zh_c, "State": rec_zh_p, "Country": "中国", "PostalCode": zip_code},
+                "Address": {"Street1": rec_street, "City": rec_city, "State": rec_state, "Country": rec_country, "PostalCode": zip_code}
+            }
+            receiving_sites.append(site_obj)
+    return receiving_sites
+
+# =====================================================================
+# 数据读取区：工作簿 -> 五张工作表
+# =====================================================================
+# 引擎用到的工作表：数据库 / 过程清单 / 信息 / 过程绩效 / 文件清单
+SHEET_KEYS = ("db", "proc", "info", "perf", "doc")
+
+# 单表最多读取的行数：格式被刷到第 1048576 行的工作簿不会再生成巨型 DataFrame。
+# 上限之后仍有数据时报错，不做截断
+MAX_SHEET_ROWS = 20000
+
+def _is_blank(v):
+    return isinstance(v, str) and not v.strip()
+
+_blank_cells = np.frompyfunc(_is_blank, 1, 1)
+
+def trim_used_range(df):
+    # 裁掉末尾的空行与空列（NaN 或纯空白字符串），保留左上角原点，行列下标不变
+    if df.empty: return df
+    values = df.to_numpy(dtype=object)
+    filled = pd.notna(values) & ~_blank_cells(values).astype(bool)
+    used_cols = filled.any(axis=0)
+    if not isinstance(df.columns, pd.RangeIndex):
+        # 带表头的表：有列名的列即使没有数据也保留
+        used_cols |= ~np.asarray(df.columns.astype(str).str.startswith("Unnamed:"), dtype=bool)
+    rows = np.flatnonzero(filled.any(axis=1))
+    cols = np.flatnonzero(used_cols)
+    last_row = rows[-1] + 1 if len(rows) else 0
+    last_col = cols[-1] + 1 if len(cols) else 0
+    if last_row == df.shape[0] and last_col == df.shape[1]: return df
+    return df.iloc[:last_row, :last_col]
+
+def read_sheet_capped(source, sheet_name, header):
+    # 多读一行：裁剪后仍超过上限说明上限处还有数据（而不只是空白格式），截断会丢数据，按读取失败处理
+    df = trim_used_range(pd.read_excel(source, sheet_name=sheet_name, header=header, nrows=MAX_SHEET_ROWS + 1))
+    if df.shape[0] > MAX_SHEET_ROWS:
+        raise ValueError(f"工作表 {sheet_name} 的数据超过 {MAX_SHEET_ROWS} 行读取上限")
+    return df
+
+def sheet_plan(sheet_names):
+    # 选表规则：key -> (工作表, header)，None 表示该表缺失、按空表处理
+    plan = {
+        "db": ('数据库', None) if '数据库' in sheet_names else (0, None),
+        "proc": ('过程清单', 0) if '过程清单' in sheet_names else None,
+        "info": ('信息', None) if '信息' in sheet_names else None,
+        "perf": ('过程绩效', None) if '过程绩效' in sheet_names else None,
+    }
+    if '文件清单' in sheet_names:
+        plan["doc"] = ('文件清单', None)
+    else:
+        plan["doc"] = (sheet_names[8], None) if len(sheet_names) >= 9 else None
+    return plan
+
+def read_workbook_frames(excel_file):
+    if isinstance(excel_file, (bytes, bytearray)):
+        excel_file = io.BytesIO(excel_file)
+
+    try:
+        xls = pd.ExcelFile(excel_file)
+        plan = sheet_plan(xls.sheet_names)
+        frames = {}
+        for key in SHEET_KEYS:
+            if plan[key] is None:
+                frames[key] = pd.DataFrame()
+            else:
+                sheet_name, header = plan[key]
+                frames[key] = read_sheet_capped(xls, sheet_name, header)
+    except Exception as e:
+        raise ValueError(f"Excel 读取失败: {str(e)}")
+
+    return frames
+
+# ---------------------------------------------------------------------
+# 并行解析：每张工作表在独立的工作进程中解析
+# ---------------------------------------------------------------------
+def _read_sheet(data, sheet_name, header):
+    return read_sheet_capped(io.BytesIO(data), sheet_name, header)
+
+class LazyFrames:
+    # 以 key 取表时才等待对应的解析结果，读取错误统一转换为 ValueError
+    def __init__(self, futures, tasks):
+        self._futures = futures
+        self._tasks = tasks
+
+    def __getitem__(self, key):
+        fut = self._futures[key]
+        if fut is None: return pd.DataFrame()
+        try:
+            try:
+                return fut.result()
+            except BrokenProcessPool:
+                # 工作进程中途被杀：本进程内串行补读该表，进程池在下次提交时重建
+                return _read_sheet(*self._tasks[key])
+        except Exception as e:
+            raise ValueError(f"Excel 读取失败: {str(e)}")
+
+    def cancel(self):
+        for fut in self._futures.values():
+            if fut is not None: fut.cancel()
+
+class SheetPool:
+    # 进程池包装：任一工作进程异常退出（OOM、SIGKILL）后整个池不可再用，提交时发现即重建并重试一次
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(len(SHEET_KEYS), os.cpu_count() or 1)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # 工作进程只执行 _read_sheet；POSIX 下使用 fork，避免子进程重新执行 Streamlit 脚本
+        ctx = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+
+    def submit(self, fn, *args):
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            with self._lock:
+                # 多个会话可能同时发现损坏，只由第一个重建
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                executor = self._executor
+            return executor.submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+def make_sheet_pool(max_workers=None):
+    return SheetPool(max_workers)
+
+def read_workbook_frames_parallel(data, pool):
+    try:
+        sheet_names = pd.ExcelFile(io.BytesIO(data)).sheet_names
+    except Exception as e:
+        raise ValueError(f"Excel 读取失败: {str(e)}")
+    plan = sheet_plan(sheet_names)
+    # 按提取流程用到的先后顺序提交：数据库 -> 信息 -> 过程绩效 -> 文件清单 -> 过程清单
+    futures, tasks = {}, {}
+    for key in ("db", "info", "perf", "doc", "proc"):
+        if plan[key] is None:
+            futures[key] = None
+            continue
+        tasks[key] = (data, *plan[key])
+        try:
+            futures[key] = pool.submit(_read_sheet, *tasks[key])
+        except BrokenProcessPool:
+            # 重建后仍不可用：退化为本进程串行读取
+            futures[key] = Future()
+            futures[key].set_exception(BrokenProcessPool("sheet pool unavailable"))
+    return LazyFrames(futures, tasks)
+
+# =====================================================================
+# 主流程区：核心转换逻辑
+# =====================================================================
+# generate_json_logic 会写入的全部字段路径（其余部分原样来自底座模板），增量输出据此生成；
+# 整数为数组下标，"*" 表示数组的每个元素。按写入先后排列，使还原后的键顺序与原文档一致；
+# 修改下方写入逻辑时需同步维护此表。
+_ORG_FIELDS = ("OrganizationName", "IndustryCode", "IATF_USI", "TotalNumberEmployees", "CertificateScope",
+               "Representative", "Telephone", "Email")
+OUTPUT_FIELDS = (
+    ("uuid",), ("created",),
+    ("AuditData", "AuditDate"), ("AuditData", "AuditDate", "Start"), ("AuditData", "AuditDate", "End"),
+    ("AuditData", "CbIdentificationNo"), ("AuditData", "AuditorName"), ("AuditData", "auditorname"),
+    *(("AuditData", "AuditTeam", 0, k) for k in ("Name", "CaaNo", "AuditorId", "AuditDaysPerformed", "DatesOnSite")),
+    ("OrganizationInformation", "AddressNative"), ("OrganizationInformation", "Address"),
+    *(("OrganizationInformation", k) for k in _ORG_FIELDS),
+    *(("OrganizationInformation", "AddressNative", k) for k in ("State", "City", "Street1", "Country")),
+    *(("OrganizationInformation", "Address", k) for k in ("State", "City", "Country", "Street1")),
+    ("OrganizationInformation", "AddressNative", "PostalCode"), ("OrganizationInformation", "Address", "PostalCode"),
+    ("ExtendedManufacturingSites",), ("ProvidingSupportSites",), ("ReceivingSupportSites",),
+    ("OrganizationInformation", "ExtendedManufacturingSite"),
+    ("CustomerInformation",), ("CustomerInformation", "Customers"),
+    ("Stage1DocumentedRequirements", "IatfClauseDocuments", "*", "DocumentName"),
+    ("Processes",),
+    ("Results", "AuditReportFinal"), ("Results", "AuditReportFinal", "Date"), ("Results", "DateNextScheduledAudit"),
+    ("Results", "AuditReportFinal", "AuditorName"),
+)
+
+def generate_json_logic(excel_file, base_data, mode, frames=None, layouts=None):
+    return generate_json_variants(excel_file, base_data, (mode,), frames, layouts)[mode]
+
+def generate_json_variants(excel_file, base_data, modes, frames=None, layouts=None):
+    # 一次提取生成多种运行模式的输出：各模式只在附属场所上不同，
+    # 审核员、日期、组织、客户、KPI、文件清单、过程等提取结果全部共用
+
+    # frames 可由快照或并行解析提供，缺省时直接解析工作簿；
+    # 各工作表在首次用到时才取出，并行解析时提取可与其余工作表的解析重叠
+    if frames is None:
+        frames = read_workbook_frames(excel_file)
+    db_df = frames["db"]
+
+    def find_val_by_key(df, keywords, col_offset=1):
+        if df.empty: return ""
+        for r in range(df.shape[0]):
+            for c in range(df.shape[1]):
+                cell_val = str(df.iloc[r, c]).strip()
+                for k in keywords:
+                    if k in cell_val:
+                        if c + col_offset < df.shape[1]:
+                            return str(df.iloc[r, c + col_offset]).strip()
+        return ""
+        
+    def get_db_val(r, c):
+        try:
+            val = db_df.iloc[r, c]
+            return str(val).strip() if pd.notna(val) else ""
+        except: return ""
+
+    raw_name_full = find_val_by_key(db_df, ["姓名", "Auditor Name"]) or get_db_val(5, 1)
+    raw_name = raw_name_full.replace("姓名:", "").replace("Name:", "").strip() if raw_name_full else ""
+    formatted_team_name = extract_and_format_english_name(raw_name_full)
+
+    ccaa_raw = find_val_by_key(db_df, ["审核员CCAA", "CCAA"]) or get_db_val(4, 1)
+    caa_no = ""
+    if ccaa_raw:
+        match = P.CCAA_NO.search(ccaa_raw)
+        caa_no = match.group(1).strip() if match else ccaa_raw.strip()
+
+    auditor_id = ""
+    info_df = frames["info"]
+    if not info_df.empty:
+        for r in range(info_df.shape[0]):
+            for c in range(info_df.shape[1]):
+                cell_text = str(info_df.iloc[r, c])
+                if "IATF Card" in cell_text or "IATF卡号" in cell_text:
+                    if c + 1 < info_df.shape[1]:
+                        raw_val = str(info_df.iloc[r, c + 1]).strip()
+                        raw_val = raw_val.replace('\n', ' ').replace('\r', ' ')
+                        auditor_id = P.IATF_PREFIX.sub('', raw_val).strip()
+                        if len(auditor_id) > 4: break
+            if auditor_id and len(auditor_id) > 4: break
+
+    start_date_raw = find_val_by_key(db_df, ["审核开始日期", "审核开始时间"]) or get_db_val(2, 1)
+    end_date_raw = find_val_by_key(db_df, ["审核结束日期", "审核结束时间"]) or get_db_val(3, 1)
+    
+    def fmt_iso(val):
+        try:
+            clean_val = str(val).replace('年', '-').replace('月', '-').replace('日', '')
+            dt = pd.to_datetime(clean_val, errors='coerce')
+            if pd.notna(dt): return dt.strftime('%Y-%m-%d') + "T00:00:00.000Z"
+        except: pass
+        return ""
+        
+    start_iso, end_iso = fmt_iso(start_date_raw), fmt_iso(end_date_raw)
+
+    kpi_map = {}
+    time_period = ""
+    
+    perf_df = frames["perf"]
+    if not perf_df.empty:
+        if perf_df.shape[0] > 1 and perf_df.shape[1] > 5:
+            raw_time = str(perf_df.iloc[1, 5]).strip()
+            time_period = fmt_iso(raw_time)
+            
+        header_r, col_map = find_layout(layouts, "perf", perf_df, PERF_WINDOW, _perf_header_at, discover_perf_layout)
+            
+        if header_r != -1:
+            current_process = ""
+            for r in range(header_r + 1, perf_df.shape[0]):
+                proc_val = str(perf_df.iloc[r, col_map['proc']]).strip() if col_map.get('proc', -1) != -1 else ""
+                
+                if proc_val and proc_val.lower() != 'nan':
+                    current_process = proc_val
+                    
+                kpi_val = str(perf_df.iloc[r, col_map['kpi']]).strip() if col_map.get('kpi', -1) != -1 else ""
+                if not kpi_val or kpi_val.lower() == 'nan':
+                    continue  
+                    
+                target_val = str(perf_df.iloc[r, col_map['target']]).strip() if col_map.get('target', -1) != -1 else ""
+                result_val = str(perf_df.iloc[r, col_map['result']]).strip() if col_map.get('result', -1) != -1 else ""
+                trend_val = str(perf_df.iloc[r, col_map['trend']]).strip() if col_map.get('trend', -1) != -1 else ""
+                
+                trend_mapped = "0"
+                if "积极" in trend_val or "1" == trend_val: trend_mapped = "1"
+                elif "消极" in trend_val or "-1" == trend_val: trend_mapped = "-1"
+                elif "一贯" in trend_val or "0" == trend_val: trend_mapped = "0"
+                else: trend_mapped = trend_val if trend_val and trend_val.lower() != 'nan' else "0"
+                
+                target_val = "" if target_val.lower() == 'nan' else target_val
+                result_val = "" if result_val.lower() == 'nan' else result_val
+                
+                if current_process not in kpi_map:
+                    kpi_map[current_process] = []
+                    
+                kpi_map[current_process].append({
+                    "KPI": kpi_val,
+                    "CurrentTarget": target_val,
+                    "Results": result_val,
+                    "TrendLastAudit": trend_mapped,
+                    "TimePeriodFrom": time_period
+                })
+    
+    next_audit_iso = ""
+    try:
+        clean_end = str(end_date_raw).replace('年', '-').replace('月', '-').replace('日', '')
+        end_dt = pd.to_datetime(clean_end, errors='coerce')
+        if pd.notna(end_dt): next_audit_iso = (end_dt + timedelta(days=45)).strftime('%Y-%m-%d') + "T00:00:00.000Z"
+    except: pass
+
+    customers_list = []
+    if not info_df.empty:
+        header_r, col_map = find_layout(layouts, "customers", info_df, CUSTOMER_WINDOW, _customer_header_at, discover_customer_layout)
+                
+        if header_r != -1:
+            for r in range(header_r + 1, info_df.shape[0]):
+                cust_val = str(info_df.iloc[r, col_map['cust']]).strip() if col_map['cust'] != -1 else ""
+                if not cust_val or cust_val.lower() == 'nan': continue
+                if "审核员" in cust_val or "AUDIT" in cust_val.upper() or "NAME" in cust_val.upper(): break
+                    
+                name_val = str(info_df.iloc[r, col_map['name']]).strip() if col_map['name'] != -1 else ""
+                date_val = str(info_df.iloc[r, col_map['date']]).strip() if col_map['date'] != -1 else ""
+                code_val = str(info_df.iloc[r, col_map['code']]).strip() if col_map['code'] != -1 else ""
+                
+                final_date = date_val.replace(" 00:00:00", "").strip()
+                customers_list.append({
+                    "Name": cust_val, "SupplierCode": code_val, "NameCSRDocument": name_val, "DateCSRDocument": final_date
+                })
+
+    if not customers_list:
+        customer_name = find_val_by_key(db_df, ["顾客", "客户名称"]) or get_db_val(29, 1)
+        supplier_code = find_val_by_key(db_df, ["供应商编码", "供应商代码"]) or get_db_val(30, 1)
+        csr_name = find_val_by_key(db_df, ["CSR文件名称"]) or get_db_val(31, 1)
+        csr_date_raw = find_val_by_key(db_df, ["CSR文件日期"]) or get_db_val(32, 1)
+        csr_date = str(csr_date_raw).replace(" 00:00:00", "").strip()
+        if csr_date.lower() == 'nan': csr_date = ""
+        if customer_name or supplier_code or csr_name:
+            customers_list.append({
+                "Name": customer_name, "SupplierCode": supplier_code, "NameCSRDocument": csr_name, "DateCSRDocument": csr_date
+            })
+
+    english_address = ""
+    native_street = ""
+    cands = []
+    if not db_df.empty:
+        for r_idx in range(9, 14):
+            if r_idx < db_df.shape[0]:
+                if 1 < db_df.shape[1]: cands.append(str(db_df.iloc[r_idx, 1]))
+                if 4 < db_df.shape[1]: cands.append(str(db_df.iloc[r_idx, 4]))
+                
+    def get_anchored(df, keywords):
+        res = []
+        if df.empty: return res
+        for r in range(df.shape[0]):
+            for c in range(df.shape[1]):
+                val = str(df.iloc[r, c]).strip().upper()
+                if any(k in val for k in keywords):
+                    res.append(str(df.iloc[r, c])) 
+                    if c + 1 < df.shape[1]: res.append(str(df.iloc[r, c+1]))
+                    if c + 2 < df.shape[1]: res.append(str(df.iloc[r, c+2]))
+                    if r + 1 < df.shape[0]: res.append(str(df.iloc[r+1, c]))
+                    if r + 1 < df.shape[0] and c+1 < df.shape[1]: res.append(str(df.iloc[r+1, c+1]))
+        return res
+        
+    cands += get_anchored(info_df, ["审核地址", "AUDIT ADDRESS", "ADDRESS"])
+    cands += get_anchored(db_df, ["地址", "ADDRESS"])
+    
+    en_parts, zh_parts = [] , []
+    for cand in cands:
+        cand = str(cand).strip()
+        if not cand or cand.lower() == 'nan': continue
+        cand = P.strip_address_prefix(cand)
+        if not cand: continue
+        
+        lines = cand.replace('\r', '\n').split('\n')
+        for line in lines:
+            line = line.strip()
+            if not line: continue
+            
+            # 每个不同的字符串只分类一次
+            feats = P.classify(line)
+            has_zh, has_en = feats.has_cjk, feats.has_latin_run
+            
+            if has_zh and has_en:
+                en_str, zh_str = P.split_bilingual(line)
+                
+                if len(en_str) > 10: en_parts.append(en_str)
+                if len(zh_str) > 5: zh_parts.append(zh_str)
+            elif has_zh: zh_parts.append(line)
+            elif has_en: en_parts.append(line)
+
+    english_address = max(en_parts, key=len) if en_parts else ""
+    native_street = max(zh_parts, key=len) if zh_parts else ""
+
+    en_street, en_city, en_state, en_country = english_address, "", "", ""
+    if english_address:
+        clean_eng = english_address.replace('，', ',')
+        parts = [p.strip() for p in clean_eng.split(',') if p.strip()]
+        if len(parts) >= 3:
+            en_country = parts[-1]
+            en_state = parts[-2]
+            en_city = parts[-3]
+            en_street = ", ".join(parts[:-3])
+        else:
+            en_street = english_address
+
+    cb_id = find_val_by_key(db_df, ["认证机构标识号"]) or get_db_val(2, 4)
+    org_name = find_val_by_key(db_df, ["组织名称"]) or get_db_val(1, 4)
+    ind_code = find_val_by_key(db_df, ["行业代码", "Industry Code"])
+    usi = find_val_by_key(db_df, ["IATF USI", "USI"]) or get_db_val(3, 4)
+    emp_total = find_val_by_key(db_df, ["包括扩展现场在内的员工总数", "员工总数"]) or get_db_val(27, 1)
+    cert_scope = find_val_by_key(db_df, ["证书范围"])
+    rep = find_val_by_key(db_df, ["组织代表", "管理者代表", "联系人", "Representative"]) or get_db_val(15, 1)
+    tel = find_val_by_key(db_df, ["联系电话", "电话", "Telephone"]) or get_db_val(15, 4)
+    email = find_val_by_key(db_df, ["电子邮箱", "邮箱", "Email", "E-mail"]) or get_db_val(16, 1)
+    postal_code = find_val_by_key(db_df, ["邮政编码"]) or get_db_val(10, 4)
+    native_p, native_c, native_s = parse_chinese_address(native_street) if native_street else ("", "", "")
+
+    doc_map = {}
+    doc_list_df = frames["doc"]
+    if not doc_list_df.empty:
+        header_r, doc_layout = find_layout(layouts, "doc", doc_list_df, DOC_WINDOW, _doc_header_at, discover_doc_layout)
+        clause_col, doc_col = doc_layout['clause'], doc_layout['doc']
+        
+        if header_r != -1:
+            for r in range(header_r + 1, doc_list_df.shape[0]):
+                clause_val = str(doc_list_df.iloc[r, clause_col]).strip()
+                if not clause_val or clause_val.lower() == 'nan': continue
+                
+                match = P.CLAUSE_NO.match(clause_val)
+                if match:
+                    clause_no = match.group(1)
+                    if clause_no.endswith('.'): clause_no = clause_no[:-1]
+                    
+                    doc_parts = []
+                    for dc in range(doc_col, min(doc_col + 3, doc_list_df.shape[1])):
+                        part_val = str(doc_list_df.iloc[r, dc]).strip()
+                        if part_val and part_val.lower() != 'nan':
+                            doc_parts.append(part_val)
+                    
+                    if doc_parts:
+                        doc_map[clause_no] = " ".join(doc_parts)
+
+    # 💥💥💥 [核心数据保护区：过程数据深度融合 (Deep Merge)] 💥💥💥
+    total_kpis_mapped = 0
+    processes_list = []
+    proc_df = frames["proc"]
+    if not proc_df.empty:
+        base_processes = copy.deepcopy(base_data.get("Processes", []))
+        
+        # 建立底座中现有过程的映射字典，以便继承隐藏参数
+        base_proc_map = {}
+        for bp in base_processes:
+            if isinstance(bp, dict):
+                name = bp.get("ProcessName", "")
+                if name:
+                    base_proc_map[P.compact(name)] = bp
+                    
+        clause_cols = proc_df.columns[13:] if proc_df.shape[1] > 13 else []
+        for idx, row in proc_df.iterrows():
+            p_name = str(row.iloc[0]).strip()
+            rep_name = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ""
+            if not p_name or p_name.lower() == 'nan': continue
+            
+            clean_p_name = P.compact(p_name)
+            
+            # 1. 尝试从底座模板中寻找该过程，完美继承底座属性
+            proc_obj = base_proc_map.get(clean_p_name)
+            
+            # 如果名字有细微差异，尝试模糊匹配
+            if not proc_obj:
+                for k, v in base_proc_map.items():
+                    if clean_p_name in k or k in clean_p_name:
+                        proc_obj = v
+                        break
+            
+            # 2. 如果底座里真的没有这个过程，才创建全新的
+            if not proc_obj:
+                proc_obj = {
+                    "Id": str(uuid.uuid4()), "ProcessName": p_name,
+                    "ManufacturingProcess": "0", "OnSiteProcess": "1", "RemoteProcess": "0",
+                    "AuditNotes": [], "ProcessPerformance": []
+                }
+            else:
+                proc_obj["ProcessName"] = p_name # 名字对齐到Excel
+                
+            if rep_name: proc_obj["RepresentativeName"] = rep_name
+            
+            # 审核员信息挂载
+            if "AuditNotes" not in proc_obj: proc_obj["AuditNotes"] = []
+            if len(proc_obj["AuditNotes"]) == 0:
+                proc_obj["AuditNotes"].append({"Id": str(uuid.uuid4())})
+            if auditor_id: proc_obj["AuditNotes"][0]["AuditorId"] = auditor_id
+            if raw_name: proc_obj["AuditNotes"][0]["AuditorName"] = raw_name
+            
+            # 3. 将新的 KPI 注入到继承来的过程对象中
+            for k, v_list in kpi_map.items():
+                clean_k = P.compact(k)
+                if clean_p_name == clean_k or clean_k in clean_p_name or clean_p_name in clean_k:
+                    proc_obj["ProcessPerformance"] = copy.deepcopy(v_list)
+                    total_kpis_mapped += len(v_list)
+                    break
+            
+            # 4. 更新条款打 X 状态
+            for col in clause_cols:
+                if str(row[col]).strip().upper() in ['X', 'TRUE']: proc_obj[col] = True
+                
+            processes_list.append(proc_obj)
+
+    b6_raw_val = get_db_val(5, 1)
+    b6_formatted_name = extract_and_format_english_name(b6_raw_val)
+
+    # 附属场所是各模式唯一的差异，按需提取且每类只提取一次
+    site_extractors = {"ems": extract_ems_sites, "rl": extract_rl_sites, "rec": extract_receiving_sites}
+    extracted_sites = {}
+    def get_sites(kind):
+        if kind not in extracted_sites:
+            extracted_sites[kind] = site_extractors[kind](info_df, layouts)
+        return copy.deepcopy(extracted_sites[kind])
+
+    # =================================================================
+    # 写入阶段：以上提取结果与模式无关，按模式逐份写入底座副本
+    # =================================================================
+    def build(mode):
+        final_json = copy.deepcopy(base_data)
+        final_json["uuid"] = str(uuid.uuid4())
+        final_json["created"] = int(time.time() * 1000)
+
+        # 💥💥💥 [数据保护：条件覆盖写入，不再用空字符串擦除底座数据] 💥💥💥
+        ensure_path(final_json, ["AuditData", "AuditDate"])
+        if start_iso: final_json["AuditData"]["AuditDate"]["Start"] = start_iso
+        if end_iso: final_json["AuditData"]["AuditDate"]["End"] = end_iso
+        
+        if cb_id: final_json["AuditData"]["CbIdentificationNo"] = cb_id
+        
+        if raw_name:
+            final_json["AuditData"]["AuditorName"] = raw_name
+            final_json["AuditData"]["auditorname"] = raw_name
+
+        if "AuditTeam" not in final_json["AuditData"] or not isinstance(final_json["AuditData"]["AuditTeam"], list) or len(final_json["AuditData"]["AuditTeam"]) == 0:
+            final_json["AuditData"]["AuditTeam"] = [{}]
+            
+        team = final_json["AuditData"]["AuditTeam"][0]
+        if isinstance(team, dict):
+            if formatted_team_name: team["Name"] = formatted_team_name
+            if caa_no: team["CaaNo"] = caa_no
+            if auditor_id: team["AuditorId"] = auditor_id
+            team["AuditDaysPerformed"] = 1.5
+            team["DatesOnSite"] = [{"Date": start_iso, "Day": 1}, {"Date": end_iso, "Day": 0.5}]
+
+        ensure_path(final_json, ["OrganizationInformation", "AddressNative"])
+        ensure_path(final_json, ["OrganizationInformation", "Address"])
+        org = final_json["OrganizationInformation"]
+        
+        # [数据保护] 只有非空才会写入
+        if org_name: org["OrganizationName"] = org_name
+        if ind_code: org["IndustryCode"] = ind_code
+        if usi: org["IATF_USI"] = usi
+        if emp_total: org["TotalNumberEmployees"] = emp_total
+        if cert_scope: org["CertificateScope"] = cert_scope
+        if rep: org["Representative"] = rep
+        if tel: org["Telephone"] = tel
+        if email and str(email).strip() != "0": org["Email"] = email
+        
+        # 组织主地址条件写入保护
+        if native_p: org["AddressNative"]["State"] = native_p
+        if native_c: org["AddressNative"]["City"] = native_c
+        if native_s: org["AddressNative"]["Street1"] = native_s
+        org["AddressNative"]["Country"] = "中国"
+        
+        if english_address:
+            if en_state: org["Address"]["State"] = en_state
+            if en_city: org["Address"]["City"] = en_city
+            if en_country: org["Address"]["Country"] = en_country
+            if en_street: org["Address"]["Street1"] = en_street
+            
+        if postal_code:
+            org["AddressNative"]["PostalCode"] = postal_code
+            org["Address"]["PostalCode"] = postal_code
+
+        if "全量综合模式" in mode:
+            ems_sites = get_sites("ems")
+            if ems_sites:
+                final_json["ExtendedManufacturingSites"] = ems_sites
+                org["ExtendedManufacturingSite"] = "1"
+            else:
+                org["ExtendedManufacturingSite"] = "0"
+                
+            support_sites = get_sites("rl")
+            if support_sites:
+                final_json["ProvidingSupportSites"] = support_sites
+                
+            receiving_sites = get_sites("rec")
+            if receiving_sites:
+                final_json["ReceivingSupportSites"] = receiving_sites
+                
+        elif "EMS" in mode:
+            ems_sites = get_sites("ems")
+            if ems_sites:
+                final_json["ExtendedManufacturingSites"] = ems_sites
+                org["ExtendedManufacturingSite"] = "1"
+            else:
+                org["ExtendedManufacturingSite"] = "0"
+                
+        elif "RL" in mode:
+            org["ExtendedManufacturingSite"] = "0"
+            support_sites = get_sites("rl")
+            if support_sites:
+                final_json["ProvidingSupportSites"] = support_sites
+                
+        else:
+            org["ExtendedManufacturingSite"] = "0"
+
+        # [数据保护] 只有获取到客户数据才重写，没有则保留底座原样
+        ensure_path(final_json, ["CustomerInformation"])
+        if customers_list:
+            final_json["CustomerInformation"]["Customers"] = []
+            for c_info in customers_list:
+                cust_obj = {
+                    "Id": str(uuid.uuid4()), "Name": c_info["Name"], "SupplierCode": c_info["SupplierCode"],
+                    "Csrs": [{"Id": str(uuid.uuid4()), "Name": c_info["Name"], "SupplierCode": c_info["SupplierCode"],
+                              "NameCSRDocument": c_info["NameCSRDocument"], "DateCSRDocument": c_info["DateCSRDocument"]}]
+                }
+                final_json["CustomerInformation"]["Customers"].append(cust_obj)
+
+        if doc_map and "Stage1DocumentedRequirements" in final_json and "IatfClauseDocuments" in final_json["Stage1DocumentedRequirements"]:
+            clause_docs = final_json["Stage1DocumentedRequirements"]["IatfClauseDocuments"]
+            for i in range(len(clause_docs)):
+                if isinstance(clause_docs[i], dict):
+                    p_no = str(clause_docs[i].get("ProcessNo", ""))
+                    if p_no in doc_map:
+                        clause_docs[i]["DocumentName"] = doc_map[p_no]
+
+        # 保护性写入：仅将Excel里列出的过程写回 JSON，且均包含继承来的底层数据
+        if processes_list:
+            final_json["Processes"] = copy.deepcopy(processes_list)
+
+        # 报告最终信息写入
+        if "Results" not in final_json: final_json["Results"] = {}
+        if "AuditReportFinal" not in final_json["Results"]: final_json["Results"]["AuditReportFinal"] = {}
+        if end_iso: final_json["Results"]["AuditReportFinal"]["Date"] = end_iso
+        if next_audit_iso: final_json["Results"]["DateNextScheduledAudit"] = next_audit_iso
+        if b6_formatted_name: final_json["Results"]["AuditReportFinal"]["AuditorName"] = b6_formatted_name
+
+        return final_json, len(doc_map), total_kpis_mapped
+
+    # 场所、新建过程与 AuditNotes 的 Id 在提取时生成、各模式共用，
+    # 第一份之后的每份输出都重新生成这些 Id；继承自底座模板的 Id 保持不变
+    results, template_ids = {}, None
+    for mode in modes:
+        results[mode] = build(mode)
+        if len(results) > 1:
+            if template_ids is None: template_ids = collect_ids(base_data, set())
+            renew_ids(results[mode][0], template_ids, {})
+    return results
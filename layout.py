@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# 布局文件格式版本：签名方式或存储结构变化时递增，旧文件整体忽略
+LAYOUT_VERSION = 3
+
+# =====================================================================
+# 表头布局缓存：按表头行的单元格文本记住已识别的表头行与列映射
+# =====================================================================
+def header_signature(df, r, cols):
+    # 签名 = 表头行在搜索列范围内各单元格的 str()。各区块的 _*_header_at 只读取这些单元格，
+    # 签名相同则该行的识别结果必然相同；表头之外的行（数据、证书号等）不参与
+    c0, c1 = cols
+    c1 = df.shape[1] if c1 is None else min(c1, df.shape[1])
+    return tuple(str(df.iat[r, c]) for c in range(c0, c1))
+
+class LayoutCache:
+    def __init__(self, path=None, max_entries=512):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (区块, 表头行, 签名) -> 列映射；_rows 为各区块已知的表头行，命中时只需读取这些行
+        self._layouts = OrderedDict()
+        self._rows = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _index(self):
+        # 调用方持有锁；超出上限时淘汰最久未用的布局，并重建各区块的已知表头行
+        while len(self._layouts) > self.max_entries:
+            self._layouts.popitem(last=False)
+        rows = {}
+        for section, header_r, _ in self._layouts:
+            known = rows.setdefault(section, [])
+            if header_r not in known: known.append(header_r)
+        self._rows = rows
+
+    def _reload(self):
+        # 其它进程（批量/预算子进程）新识别的布局也会写入同一文件，未命中时重新载入
+        if not self.path: return
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime: return
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._mtime = mtime
+            if not isinstance(stored, dict) or stored.get("version") != LAYOUT_VERSION: return
+            self._merge(stored.get("layouts", []))
+
+    def _merge(self, entries):
+        # 调用方持有锁；返回是否出现了新布局
+        added = False
+        for section, header_r, signature, col_map in entries:
+            key = (section, header_r, tuple(signature))
+            if key not in self._layouts:
+                self._layouts[key] = dict(col_map)
+                added = True
+        if added: self._index()
+        return added
+
+    def _persist(self):
+        if not self.path: return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            stored = {"version": LAYOUT_VERSION, "layouts": self._entries()}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+    def _entries(self):
+        return [[section, header_r, list(signature), col_map] for (section, header_r, signature), col_map in self._layouts.items()]
+
+    def _lookup(self, section, df, window):
+        cols = window[2:]
+        for header_r in self._rows.get(section, ()):
+            if header_r >= df.shape[0]: continue
+            key = (section, header_r, header_signature(df, header_r, cols))
+            with self._lock:
+                col_map = self._layouts.get(key)
+                if col_map is None: continue
+                self._layouts.move_to_end(key)
+                self.hits += 1
+            return header_r, dict(col_map)
+        return None
+
+    def resolve(self, section, df, window, header_at, discover):
+        hit = self._lookup(section, df, window)
+        if hit is None:
+            self._reload()
+            hit = self._lookup(section, df, window)
+        if hit is not None: return hit
+
+        with self._lock: self.misses += 1
+        header_r, col_map = discover(df)
+        # 只记住能由表头行单独复现的布局：区块不存在 (-1) 只能靠扫描确认，
+        # 跨行拼出的列映射（如条款列与文件列不在同一行）也不缓存，下次照常完整扫描
+        if header_r == -1 or header_at(df, header_r) != col_map: return header_r, col_map
+        entry = [section, header_r, header_signature(df, header_r, window[2:]), col_map]
+        with self._lock:
+            is_new = self._merge([entry])
+        # 只在出现新布局时写盘；同一模板版本之后的文件全部命中，不再改写
+        if is_new: self._persist()
+        return header_r, col_map
+
+    def snapshot(self):
+        # 可序列化的布局表，交给预算子进程使用
+        with self._lock:
+            return self._entries()
+
+    def merge(self, entries):
+        # 并入预算子进程识别出的新布局
+        with self._lock:
+            is_new = self._merge(entries)
+        if is_new: self._persist()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "layouts": len(self._layouts)}
@@ -0,0 +1,300 @@
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from openpyxl import Workbook
+
+# =====================================================================
+# 并发会话压测：用 Streamlit AppTest 无浏览器驱动 app.py
+# =====================================================================
+# 每个线程模拟一个浏览器会话：上传模板 -> 上传合成工作簿（计时：转换延迟）
+# -> 点击下载按钮触发一次重跑（计时：重跑开销）。全部在本进程内完成，无需网络。
+# 依赖支持 file_uploader.set_value / download_button.click 的 Streamlit AppTest。
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+TEMPLATE_LABEL = "上传基础 JSON 模板"
+WORKBOOK_LABEL = "支持批量上传 .xlsx 格式文件"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# =====================================================================
+# 合成数据
+# =====================================================================
+def make_template(n_clauses=40):
+    template = {
+        "uuid": "", "created": 0,
+        "AuditData": {"AuditTeam": [{}]},
+        "OrganizationInformation": {"AddressNative": {}, "Address": {}},
+        "CustomerInformation": {},
+        "Stage1DocumentedRequirements": {
+            "IatfClauseDocuments": [{"ProcessNo": f"{4 + i // 10}.{i % 10 + 1}", "DocumentName": ""} for i in range(n_clauses)]
+        },
+        "Processes": [],
+        "Results": {},
+    }
+    return json.dumps(template, ensure_ascii=False).encode("utf-8")
+
+def make_workbook(seed, n_processes=20):
+    wb = Workbook()
+    db = wb.active
+    db.title = "数据库"
+    rows = [
+        ("组织名称", f"合成测试组织 {seed}", None, "组织名称", f"合成测试组织 {seed}"),
+        ("审核开始日期", "2024-03-01", None, "认证机构标识号", "CB-001"),
+        ("审核结束日期", "2024-03-02", None, "IATF USI", f"USI{seed:06d}"),
+        ("审核员CCAA", "CCAA: 2021-NQA-000123"),
+        ("姓名", "姓名: ZHANG San 张三"),
+    ]
+    for r, values in enumerate(rows, start=2):
+        for c, v in enumerate(values, start=1):
+            if v is not None: db.cell(r, c, v)
+    db.cell(11, 1, "地址"); db.cell(11, 2, f"中国江苏省苏州市工业园区星湖街{seed}号")
+    db.cell(11, 4, "邮政编码"); db.cell(11, 5, "215000")
+    db.cell(12, 1, "ADDRESS"); db.cell(12, 2, f"No.{seed} Xinghu Street, Suzhou, Jiangsu, China")
+
+    info = wb.create_sheet("信息")
+    info.cell(3, 1, "IATF Card"); info.cell(3, 2, "IATF: 5-ABC-123456")
+    for c, v in enumerate(("Customer", "CSR Title", "Version/Date", "Supplier Code"), start=1):
+        info.cell(6, c, v)
+    for i in range(5):
+        for c, v in enumerate((f"客户{i}", f"CSR {i}", "2023-01-01", f"S{i:03d}"), start=1):
+            info.cell(7 + i, c, v)
+    info.cell(12, 1, "审核员")
+    for c, v in enumerate(("EMS扩展场所信息 中文名称", "英文名称", "中文地址", "英文地址", "邮编", "USI", "人数"), start=6):
+        info.cell(22, c, v)
+    for c, v in enumerate(("扩展厂", "Ext Plant", "浙江省杭州市西湖区1号", "1 Road, Hangzhou, Zhejiang, China", "310000", "U9", "20"), start=6):
+        info.cell(23, c, v)
+
+    proc = wb.create_sheet("过程清单")
+    for c, v in enumerate(["过程", "说明", "负责人"] + [f"列{i}" for i in range(3, 13)] + ["4.1", "4.2", "5.1"], start=1):
+        proc.cell(1, c, v)
+    perf = wb.create_sheet("过程绩效")
+    perf.cell(2, 6, "2023-06-01")
+    for c, v in enumerate(("过程", "KPI名称", "目标", "结果", "趋势"), start=1):
+        perf.cell(4, c, v)
+    for k in range(n_processes):
+        proc.cell(k + 2, 1, f"过程{k}"); proc.cell(k + 2, 3, f"负责人{k}"); proc.cell(k + 2, 14, "X")
+        perf.cell(5 + 2 * k, 1, f"过程{k}")
+        for j in range(2):
+            for c, v in enumerate((f"KPI{k}-{j}", "95%", "96%", "积极"), start=2):
+                perf.cell(5 + 2 * k + j, c, v)
+
+    docs = wb.create_sheet("文件清单")
+    docs.cell(2, 1, "标准条款"); docs.cell(2, 2, "公司内对应的程序文件")
+    for i in range(30):
+        docs.cell(3 + i, 1, f"{4 + i // 10}.{i % 10 + 1}"); docs.cell(3 + i, 2, f"QP-{i:02d}")
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+# =====================================================================
+# 测量工具
+# =====================================================================
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+class RssSampler:
+    # 后台线程定期采样常驻内存，记录本并发级别内的峰值
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+def percentile(values, pct):
+    # 最近秩法：rank = ceil(p/100 * n)，取第 rank 小的样本
+    if not values: return float("nan")
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+# =====================================================================
+# 单个会话
+# =====================================================================
+_compile_lock = threading.Lock()
+_last_runtime = {}
+
+def _make_apptest_concurrent():
+    # AppTest 假定同一时刻只有一个实例在运行，并发会话前需修补两处进程级状态：
+    # 1) CPython 3.11 的 ast.parse 非线程安全，同时首次编译 app.py 会随机报 SystemError，
+    #    因此串行化编译这一步（每个会话仅一次），脚本执行本身仍然并发；
+    # 2) 每次 run() 结束都会把 Runtime._instance 置空，其它仍在运行的会话随即报
+    #    "Runtime hasn't been created!"，因此让它回退到最近一次装入的模拟 Runtime。
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import script_cache
+
+    original_get_bytecode = script_cache.ScriptCache.get_bytecode
+    if getattr(original_get_bytecode, "_loadtest_patched", False): return
+
+    def get_bytecode(self, script_path):
+        with _compile_lock:
+            return original_get_bytecode(self, script_path)
+
+    def instance(cls):
+        runtime = cls._instance or _last_runtime.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        _last_runtime["runtime"] = runtime
+        return runtime
+
+    def exists(cls):
+        return (cls._instance or _last_runtime.get("runtime")) is not None
+
+    get_bytecode._loadtest_patched = True
+    script_cache.ScriptCache.get_bytecode = get_bytecode
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+def _widget(widgets, label):
+    for w in widgets:
+        if w.label == label: return w
+    raise LookupError(f"页面上未找到控件: {label}")
+
+def run_session(session_id, args, template_bytes, results):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    try:
+        at.run()
+        _widget(at.file_uploader, TEMPLATE_LABEL).set_value(("template.json", template_bytes, "application/json"))
+        at.run()
+        if args.batch:
+            _widget(at.toggle, "批量落盘模式 (大批量文件推荐)").set_value(True)
+        if args.no_cache:
+            _widget(at.toggle, "启用持久化转换缓存").set_value(False)
+
+        for round_no in range(args.rounds):
+            seed = session_id * 1000 + round_no if args.distinct else 0
+            uploads = [
+                (f"session{session_id}_round{round_no}_{i}.xlsx", make_workbook(seed * 100 + i, args.processes), XLSX_MIME)
+                for i in range(args.files)
+            ]
+            _widget(at.file_uploader, WORKBOOK_LABEL).set_value(uploads)
+            t0 = time.perf_counter()
+            at.run()
+            results["convert"].append(time.perf_counter() - t0)
+
+            if at.exception or at.error:
+                results["errors"].append(f"会话 {session_id}: " + "; ".join(str(e.value) for e in [*at.exception, *at.error]))
+                continue
+
+            if at.download_button:
+                at.download_button[0].click()
+            t0 = time.perf_counter()
+            at.run()
+            results["rerun"].append(time.perf_counter() - t0)
+    except Exception as e:
+        results["errors"].append(f"会话 {session_id}: {type(e).__name__}: {e}")
+
+def run_level(concurrency, args, template_bytes):
+    results = {"convert": [], "rerun": [], "errors": []}
+    threads = [
+        threading.Thread(target=run_session, args=(i, args, template_bytes, results), daemon=True)
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    with RssSampler() as sampler:
+        for t in threads: t.start()
+        for t in threads: t.join()
+    results["wall"] = time.perf_counter() - started
+    results["peak_rss_mb"] = sampler.peak_mb
+    return results
+
+def _report_levels(levels, args, template_bytes, report):
+    print(f"{'并发':>4} {'转换次数':>8} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} {'重跑p50':>8} {'重跑p95':>8} {'峰值RSS(MB)':>11} {'错误':>4}")
+    for level in levels:
+        res = run_level(level, args, template_bytes)
+        row = {
+            "concurrency": level,
+            "conversions": len(res["convert"]),
+            "convert_p50": percentile(res["convert"], 50),
+            "convert_p95": percentile(res["convert"], 95),
+            "convert_p99": percentile(res["convert"], 99),
+            "rerun_p50": percentile(res["rerun"], 50),
+            "rerun_p95": percentile(res["rerun"], 95),
+            "rerun_p99": percentile(res["rerun"], 99),
+            "peak_rss_mb": res["peak_rss_mb"],
+            "wall_s": res["wall"],
+            "errors": res["errors"],
+        }
+        report.append(row)
+        print(
+            f"{level:>4} {row['conversions']:>8} {row['convert_p50']:>8.2f} {row['convert_p95']:>8.2f} {row['convert_p99']:>8.2f} "
+            f"{row['rerun_p50']:>8.2f} {row['rerun_p95']:>8.2f} {row['peak_rss_mb']:>11.1f} {len(row['errors']):>4}"
+        )
+        for err in res["errors"][:5]:
+            print(f"     ! {err}")
+
+# =====================================================================
+# 命令行入口
+# =====================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IATF 审计转换页面并发会话压测 (Streamlit AppTest, 无浏览器)")
+    parser.add_argument("--levels", default="1,2,4,8", help="并发会话数，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=3, help="每个会话上传几轮工作簿")
+    parser.add_argument("--files", type=int, default=1, help="每轮上传的工作簿数量")
+    parser.add_argument("--processes", type=int, default=20, help="合成工作簿中的过程数量")
+    parser.add_argument("--batch", action="store_true", help="启用批量落盘模式")
+    parser.add_argument("--no-cache", action="store_true", help="关闭持久化转换缓存")
+    parser.add_argument("--same-workbooks", dest="distinct", action="store_false", help="所有会话上传相同的工作簿（测试缓存与合并）")
+    parser.add_argument("--timeout", type=float, default=300, help="单次脚本运行超时 (秒)")
+    parser.add_argument("--json", dest="json_path", help="将结果另存为 JSON")
+    parser.add_argument("--keep-cache-dir", action="store_true", help="结束后保留临时缓存目录")
+    args = parser.parse_args(argv)
+
+    # 缓存、快照写入临时目录，不污染真实缓存；必须在 app 首次导入 cache 模块前设置
+    cache_dir = tempfile.mkdtemp(prefix="iatf_loadtest_")
+    os.environ["IATF_CACHE_DIR"] = cache_dir
+    _make_apptest_concurrent()
+    # 工作线程没有 ScriptRunContext 的告警对压测无意义；AppTest 每次运行都会按配置重置日志级别，故直接禁用该 logger
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+
+    template_bytes = make_template()
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    report = []
+
+    print(f"缓存目录: {cache_dir}")
+    try:
+        _report_levels(levels, args, template_bytes, report)
+    finally:
+        if not args.keep_cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
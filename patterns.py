@@ -0,0 +1,70 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# =====================================================================
+# 正则模式库：引擎用到的全部模式在导入时一次编译
+# =====================================================================
+WHITESPACE = re.compile(r'\s+')
+NON_LATIN = re.compile(r'[^a-zA-Z\s]')
+LATIN_CHAR = re.compile(r'[a-zA-Z]')
+CJK_CHAR = re.compile(r'[\u4e00-\u9fff]')
+CJK_PUNCT = re.compile(r'[，。；（）]')
+
+CCAA_NO = re.compile(r'(?:CCAA[:：\s-])\s*(.*)', re.IGNORECASE | re.DOTALL)
+IATF_PREFIX = re.compile(r'^IATF[:：\s-]*', re.IGNORECASE)
+ADDRESS_PREFIX = re.compile(r'^(审核地址|组织地址|企业地址|地址|现场地址|AUDIT ADDRESS|ADDRESS)[\s:：]*', re.IGNORECASE)
+CLAUSE_NO = re.compile(r'^([\d\.]+)')
+
+CN_COUNTRY_PREFIX = re.compile(r'^中国')
+CN_PROVINCE = re.compile(r'(.+?(省|自治区|北京市|上海市|天津市|重庆市|北京|上海|天津|重庆))')
+CN_CITY = re.compile(r'(.+?(市|自治州|地区|盟))')
+
+# 单次扫描同时识别中文字符与连续 3 个以上的拉丁字母
+_FEATURE_SCAN = re.compile(r'(?P<cjk>[\u4e00-\u9fff])|(?P<latin>[a-zA-Z]{3,})')
+_DATE = re.compile(r'\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?')
+# 编号：无空白、含数字，由字母数字与常见分隔符组成，如 5-ABC-123456、USI000001、215000
+_ID = re.compile(r'(?=[^\d]*\d)[A-Za-z0-9][A-Za-z0-9\-/_.:]{3,}')
+
+# =====================================================================
+# 单元格文本分类：同一字符串只分析一次
+# =====================================================================
+TextFeatures = namedtuple("TextFeatures", ["has_cjk", "has_latin_run"])
+
+@lru_cache(maxsize=65536)
+def classify(text):
+    # 一次扫描得出两项特征，两项都出现即提前结束
+    has_cjk = has_latin_run = False
+    for m in _FEATURE_SCAN.finditer(text):
+        if m.lastgroup == "cjk": has_cjk = True
+        else: has_latin_run = True
+        if has_cjk and has_latin_run: break
+    return TextFeatures(has_cjk, has_latin_run)
+
+# 编号 / 日期判断按需调用，不计入 classify 的单次扫描
+@lru_cache(maxsize=16384)
+def is_date(text):
+    return _DATE.fullmatch(text) is not None
+
+@lru_cache(maxsize=16384)
+def is_id(text):
+    return not classify(text).has_cjk and not is_date(text) and _ID.fullmatch(text) is not None
+
+@lru_cache(maxsize=16384)
+def split_bilingual(line):
+    # 中英混排的一行拆成 (英文部分, 中文部分)
+    en_str = CJK_CHAR.sub(' ', line)
+    en_str = CJK_PUNCT.sub(' ', en_str)
+    en_str = WHITESPACE.sub(' ', en_str).strip(" ()-.,")
+    zh_str = LATIN_CHAR.sub('', line)
+    zh_str = WHITESPACE.sub(' ', zh_str).strip(" ()-.,")
+    return en_str, zh_str
+
+@lru_cache(maxsize=16384)
+def strip_address_prefix(text):
+    return ADDRESS_PREFIX.sub('', text).strip()
+
+@lru_cache(maxsize=16384)
+def compact(text):
+    # 去除全部空白，用于过程名称比对
+    return WHITESPACE.sub('', text)
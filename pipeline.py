@@ -0,0 +1,140 @@
+import copy
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from engine import source_bytes, collect_ids, renew_ids, generate_json_variants, read_workbook_frames, read_workbook_frames_parallel
+from cache import conversion_key, template_hash
+from layout import LayoutCache
+
+# =====================================================================
+# 并发合并：同一时刻对同一工作簿的重复转换只计算一次
+# =====================================================================
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args):
+        # 返回 (结果, 是否为跟随者)；跟随者等待领头者的结果，异常同样传递
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+        if not leader:
+            return fut.result(), True
+
+        try:
+            result = fn(*args)
+            fut.set_result(result)
+            return result, False
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+# 进程级单例：所有 Streamlit 会话共用
+_inflight = SingleFlight()
+
+def _as_new_document(result, base_data):
+    # 复用的结果视同一次新的转换：重新生成文档标识、时间戳，以及引擎生成的嵌套 Id
+    # （场所、客户、Csrs、新建过程与 AuditNotes）；继承自底座模板的 Id 保持不变
+    res_json, mapped_doc_count, mapped_kpi_count = result
+    res_json["uuid"] = str(uuid.uuid4())
+    res_json["created"] = int(time.time() * 1000)
+    renew_ids(res_json, collect_ids(base_data, set()), {})
+    return res_json, mapped_doc_count, mapped_kpi_count
+
+# =====================================================================
+# 统一转换入口：转换缓存 -> 并发合并 -> 工作簿快照 -> (并行) 解析 -> 核心转换
+# =====================================================================
+def _convert_uncached(data, base_data, modes, snapshots=None, pool=None, layouts=None):
+    frames, digest = None, None
+    if snapshots is not None:
+        digest = snapshots.digest(data)
+        frames = snapshots.load(digest)
+    snapshot_hit = frames is not None
+
+    if frames is None and pool is not None:
+        frames = read_workbook_frames_parallel(data, pool)
+    elif frames is None and snapshots is not None:
+        frames = read_workbook_frames(data)
+
+    try:
+        results = generate_json_variants(data, base_data, modes, frames=frames, layouts=layouts)
+    finally:
+        if hasattr(frames, "cancel"): frames.cancel()
+
+    if snapshots is not None and not snapshot_hit:
+        snapshots.save(digest, frames)
+    return results
+
+def _convert_isolated(data, base_data, modes, frames, known_layouts, return_frames):
+    # 预算子进程入口：只接收字节、模板、模式以及可序列化的快照表格与布局表，
+    # 不接触父进程的快照仓库、布局缓存与解析进程池；子进程内串行解析
+    layouts = None
+    if known_layouts is not None:
+        layouts = LayoutCache()
+        layouts.merge(known_layouts)
+    parsed = frames is None
+    if parsed:
+        frames = read_workbook_frames(data)
+    results = generate_json_variants(data, base_data, modes, frames=frames, layouts=layouts)
+    return results, (frames if parsed and return_frames else None), (layouts.snapshot() if layouts is not None else None)
+
+def _convert_budgeted(data, base_data, modes, snapshots, budget, layouts):
+    # 快照读写与布局表的读取、并入都在本进程完成
+    frames, digest = None, None
+    if snapshots is not None:
+        digest = snapshots.digest(data)
+        frames = snapshots.load(digest)
+    known_layouts = layouts.snapshot() if layouts is not None else None
+    results, parsed, learned = budget.run(
+        _convert_isolated, data, base_data, modes, frames, known_layouts, snapshots is not None and frames is None
+    )
+    if parsed is not None:
+        snapshots.save(digest, parsed)
+    if learned:
+        layouts.merge(learned)
+    return results
+
+def _convert_and_store(keys, data, base_data, modes, cache, snapshots, pool, budget, layouts):
+    if budget is not None:
+        results = _convert_budgeted(data, base_data, modes, snapshots, budget, layouts)
+    else:
+        results = _convert_uncached(data, base_data, modes, snapshots, pool, layouts)
+    if cache is not None:
+        for mode in modes:
+            cache.put(keys[mode], *results[mode])
+    return results
+
+def convert_workbook_variants(excel_file, base_data, modes, cache=None, snapshots=None, tpl_hash=None, pool=None, budget=None, layouts=None):
+    # 多种运行模式共用一次提取；已缓存的模式直接读取，只有缺失的模式参与本次提取
+    data = source_bytes(excel_file)
+    tpl_hash = tpl_hash or template_hash(base_data)
+    keys = {mode: conversion_key(data, tpl_hash, mode) for mode in modes}
+
+    results = {}
+    if cache is not None:
+        for mode in keys:
+            hit = cache.get(keys[mode])
+            if hit is not None:
+                results[mode] = _as_new_document(hit, base_data)
+
+    missing = tuple(mode for mode in keys if mode not in results)
+    if missing:
+        flight_key = "|".join(keys[mode] for mode in missing)
+        fresh, shared = _inflight.do(flight_key, _convert_and_store, keys, data, base_data, missing, cache, snapshots, pool, budget, layouts)
+        for mode in missing:
+            # 领头者的结果对象归其会话所有，跟随者拿一份独立副本
+            results[mode] = _as_new_document(copy.deepcopy(fresh[mode]), base_data) if shared else fresh[mode]
+    return results
+
+def convert_workbook(excel_file, base_data, mode, cache=None, snapshots=None, tpl_hash=None, pool=None, budget=None, layouts=None):
+    return convert_workbook_variants(
+        excel_file, base_data, (mode,), cache=cache, snapshots=snapshots, tpl_hash=tpl_hash, pool=pool, budget=budget, layouts=layouts
+    )[mode]
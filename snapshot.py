@@ -0,0 +1,151 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from engine import SHEET_KEYS
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB, exclusive_dir
+
+# 快照格式版本：编码方式或读取逻辑变化时递增，旧快照自动失效
+SNAPSHOT_VERSION = 3
+
+# =====================================================================
+# 列式编码：字符串表 + int32 编码矩阵
+# =====================================================================
+# 引擎对单元格只做 str() / 判空两种操作，因此快照只保存单元格的字符串形式，
+# 空单元格编码为 -1，加载时还原为 NaN。
+def _encode_frame(df):
+    table, index = [], {}
+    values = df.to_numpy(dtype=object)
+    codes = np.full(values.shape, -1, dtype=np.int32)
+    for r in range(values.shape[0]):
+        for c in range(values.shape[1]):
+            v = values[r, c]
+            if pd.isna(v): continue
+            s = str(v)
+            code = index.get(s)
+            if code is None:
+                code = index[s] = len(table)
+                table.append(s)
+            codes[r, c] = code
+
+    encoded = [s.encode("utf-8") for s in table]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    columns = None if isinstance(df.columns, pd.RangeIndex) else [str(c) for c in df.columns]
+    return codes, offsets, b"".join(encoded), columns
+
+def _decode_frame(prefix, columns):
+    codes = np.load(prefix + ".codes.npy", mmap_mode="r")
+    offsets = np.load(prefix + ".offsets.npy", mmap_mode="r")
+
+    table = np.empty(len(offsets), dtype=object)
+    table[-1] = np.nan
+    if offsets[-1] > 0:
+        with open(prefix + ".strings.bin", "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as blob:
+            for i in range(len(offsets) - 1):
+                table[i] = blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    if codes.size == 0:
+        return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+    # 编码 -1 恰好索引到表尾的 NaN。table[codes] 会生成完整的对象矩阵：映射只省去读文件的缓冲拷贝，
+    # 返回的 DataFrame 不再由映射文件支撑（引擎以 iloc 随机读取单元格，需要常规的 DataFrame）
+    return pd.DataFrame(table[codes], columns=columns)
+
+# =====================================================================
+# 快照仓库：按工作簿内容哈希存放，首次读取时写入，按大小 LRU 淘汰
+# =====================================================================
+class SnapshotStore:
+    def __init__(self, root=None, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "snapshots")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def digest(workbook_bytes):
+        h = hashlib.sha256(workbook_bytes)
+        h.update(f"\0snapshot-v{SNAPSHOT_VERSION}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _dir(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def load(self, digest):
+        snap_dir = self._dir(digest)
+        meta_path = os.path.join(snap_dir, "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            frames = {key: _decode_frame(os.path.join(snap_dir, key), meta["columns"][key]) for key in SHEET_KEYS}
+            # 命中即刷新 meta.json 的修改时间，作为 LRU 的访问顺序
+            os.utime(meta_path)
+            return frames
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, digest, frames):
+        snap_dir = self._dir(digest)
+        if os.path.isdir(snap_dir): return
+        os.makedirs(os.path.dirname(snap_dir), exist_ok=True)
+        # 先写入临时目录再整体改名，其它进程不会读到写了一半的快照
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(snap_dir), prefix=".tmp_")
+        try:
+            meta = {"version": SNAPSHOT_VERSION, "columns": {}}
+            for key in SHEET_KEYS:
+                codes, offsets, blob, columns = _encode_frame(frames[key])
+                prefix = os.path.join(tmp_dir, key)
+                np.save(prefix + ".codes.npy", codes)
+                np.save(prefix + ".offsets.npy", offsets)
+                with open(prefix + ".strings.bin", "wb") as f:
+                    f.write(blob)
+                meta["columns"][key] = columns
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.rename(tmp_dir, snap_dir)
+        except OSError:
+            # 快照只是加速手段：目标已被其它进程写入或磁盘不可写时直接放弃
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for sub in os.scandir(self.root):
+            if not sub.is_dir(): continue
+            for snap in os.scandir(sub.path):
+                if snap.name.startswith(".") or not snap.is_dir(): continue
+                try:
+                    mtime = os.stat(os.path.join(snap.path, "meta.json")).st_mtime
+                    size = sum(item.stat().st_size for item in os.scandir(snap.path))
+                except OSError:
+                    continue
+                entries.append((mtime, size, snap.path))
+        return entries
+
+    def evict(self):
+        with exclusive_dir(self.root, self._lock):
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes: return
+            for _, size, path in sorted(entries):
+                # 先改名再删除：并发读者要么读到完整快照，要么找不到快照回退到解析
+                trash = os.path.join(os.path.dirname(path), ".del_" + os.path.basename(path))
+                try:
+                    os.rename(path, trash)
+                except OSError:
+                    continue
+                shutil.rmtree(trash, ignore_errors=True)
+                total -= size
+                if total <= self.max_bytes: break
+
+    def stats(self):
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from factories import make_template, make_workbook
+
+@pytest.fixture(scope="session")
+def template():
+    return make_template()
+
+@pytest.fixture(scope="session")
+def workbook():
+    return make_workbook(1)
+
+@pytest.fixture(scope="session")
+def other_workbook():
+    return make_workbook(2, n_processes=5)
@@ -0,0 +1,84 @@
+import io
+
+from openpyxl import Workbook
+
+# 与 app.RUN_MODES 一致；测试不导入 app.py（其中是 Streamlit 页面脚本）
+RUN_MODES = (
+    "纯净标准模式 (无附属场所)",
+    "单提取：EMS 扩展场所 (F21-M25)",
+    "单提取：RL 支持场所 (F27-N32)",
+    "全量综合模式 (提取 EMS + RL + 被支持场所)"
+)
+
+# =====================================================================
+# 测试数据：底座模板与合成工作簿
+# =====================================================================
+def make_template(n_clauses=40):
+    return {
+        "uuid": "", "created": 0,
+        "AuditData": {"AuditTeam": [{}]},
+        "OrganizationInformation": {"AddressNative": {}, "Address": {}},
+        "CustomerInformation": {},
+        "Stage1DocumentedRequirements": {
+            "IatfClauseDocuments": [{"ProcessNo": f"{4 + i // 10}.{i % 10 + 1}", "DocumentName": ""} for i in range(n_clauses)]
+        },
+        "Processes": [{"Id": "tpl-process-0", "ProcessName": "过程0", "AuditNotes": [{"Id": "tpl-note-0"}]}],
+        "Results": {},
+    }
+
+def _fill_row(sheet, row, values, start_col=1):
+    for c, v in enumerate(values, start=start_col):
+        if v is not None: sheet.cell(row, c, v)
+
+def make_workbook(seed, n_processes=20, support_sites=True):
+    # 五张工作表齐全；信息表含 EMS 区块，support_sites 时再加 RL / 被支持场所区块
+    wb = Workbook()
+    db = wb.active
+    db.title = "数据库"
+    rows = [
+        ("组织名称", f"合成测试组织 {seed}", None, "组织名称", f"合成测试组织 {seed}"),
+        ("审核开始日期", "2024-03-01", None, "认证机构标识号", "CB-001"),
+        ("审核结束日期", "2024-03-02", None, "IATF USI", f"USI{seed:06d}"),
+        ("审核员CCAA", "CCAA: 2021-NQA-000123"),
+        ("姓名", "姓名: ZHANG San 张三"),
+    ]
+    for r, values in enumerate(rows, start=2):
+        _fill_row(db, r, values)
+    _fill_row(db, 11, ("地址", f"中国江苏省苏州市工业园区星湖街{seed}号", None, "邮政编码", "215000"))
+    _fill_row(db, 12, ("ADDRESS", f"No.{seed} Xinghu Street, Suzhou, Jiangsu, China"))
+
+    info = wb.create_sheet("信息")
+    _fill_row(info, 3, ("IATF Card", f"IATF: 5-ABC-{seed:06d}"))
+    _fill_row(info, 6, ("Customer", "CSR Title", "Version/Date", "Supplier Code"))
+    for i in range(5):
+        _fill_row(info, 7 + i, (f"客户{i}", f"CSR {i}", "2023-01-01", f"S{i:03d}"))
+    info.cell(12, 1, "审核员")
+    site_headers = ("中文名称", "英文名称", "中文地址", "英文地址", "邮编", "USI", "人数", "支持功能")
+    _fill_row(info, 22, ("EMS扩展场所信息 " + site_headers[0],) + site_headers[1:7], start_col=6)
+    _fill_row(info, 23, ("扩展厂", "Ext Plant", "浙江省杭州市西湖区1号", "1 Road, Hangzhou, Zhejiang, China", "310000", "U9", "20"), start_col=6)
+    if support_sites:
+        _fill_row(info, 28, ("RL支持场所 " + site_headers[0],) + site_headers[1:], start_col=6)
+        _fill_row(info, 29, ("设计中心", "Design Center", "上海市浦东新区张江路1号", "1 Zhangjiang Rd, Shanghai, Shanghai, China", "201203", "U7", "35", "产品设计"), start_col=6)
+        _fill_row(info, 34, ("被支持场所 " + site_headers[0],) + site_headers[1:], start_col=6)
+        _fill_row(info, 35, ("总装厂", "Assembly Plant", "广东省广州市番禺区2号", "2 Panyu Rd, Guangzhou, Guangdong, China", "511400", "U8", "120", "采购"), start_col=6)
+
+    proc = wb.create_sheet("过程清单")
+    _fill_row(proc, 1, ["过程", "说明", "负责人"] + [f"列{i}" for i in range(3, 13)] + ["4.1", "4.2", "5.1"])
+    perf = wb.create_sheet("过程绩效")
+    perf.cell(2, 6, "2023-06-01")
+    _fill_row(perf, 4, ("过程", "KPI名称", "目标", "结果", "趋势"))
+    for k in range(n_processes):
+        _fill_row(proc, k + 2, (f"过程{k}", None, f"负责人{k}"))
+        proc.cell(k + 2, 14, "X")
+        perf.cell(5 + 2 * k, 1, f"过程{k}")
+        for j in range(2):
+            _fill_row(perf, 5 + 2 * k + j, (f"KPI{k}-{j}", "95%", "96%", "积极"), start_col=2)
+
+    docs = wb.create_sheet("文件清单")
+    _fill_row(docs, 2, ("标准条款", "公司内对应的程序文件"))
+    for i in range(30):
+        _fill_row(docs, 3 + i, (f"{4 + i // 10}.{i % 10 + 1}", f"QP-{i:02d}"))
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
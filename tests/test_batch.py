@@ -0,0 +1,121 @@
+import gzip
+import io
+import json
+import os
+import time
+
+import pytest
+
+import batch
+from factories import RUN_MODES, make_workbook
+from batch import BatchSpool, JsonlSpool, run_batch, sweep_stale_spools
+from delta import apply_delta, is_delta
+
+class Upload(io.BytesIO):
+    # 模拟 Streamlit 上传文件：带 name 的字节流
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def _uploads(n):
+    return [Upload(make_workbook(seed, n_processes=3), f"wb{seed}.xlsx") for seed in range(n)]
+
+# =====================================================================
+# 落盘暂存区
+# =====================================================================
+def test_spool_writes_documents_and_summaries(tmp_path):
+    spool = BatchSpool(str(tmp_path))
+    doc = {"ExtendedManufacturingSites": [{}], "OrganizationInformation": {"ExtendedManufacturingSite": "1"}}
+    first = spool.write("a.xlsx", doc, 3, 4)
+    second = spool.write("dir/a.xlsx", doc, 0, 0)
+    spool.fail("b.xlsx", ValueError("坏文件"))
+
+    assert first["path"] != second["path"]
+    assert json.loads(spool.read_bytes(first["path"])) == doc
+    assert (first["ems_count"], first["doc_count"], first["kpi_count"], first["ems_flag"]) == (1, 3, 4, "1")
+    assert [s["status"] for s in spool.summaries] == ["ok", "ok", "error"]
+    assert spool.summaries[-1]["error"] == "坏文件"
+
+    spool.cleanup()
+    assert not os.path.exists(str(tmp_path))
+
+def test_spool_writes_the_given_document(tmp_path):
+    spool = BatchSpool(str(tmp_path))
+    summary = spool.write("a.xlsx", {"Processes": [1, 2]}, 0, 0, document={"patch": []})
+    assert json.loads(spool.read_bytes(summary["path"])) == {"patch": []}
+
+def test_sweep_removes_only_stale_spools(tmp_path):
+    stale, fresh, other = (tmp_path / (batch.SPOOL_PREFIX + "old")), (tmp_path / (batch.SPOOL_PREFIX + "new")), (tmp_path / "keep_me")
+    for d in (stale, fresh, other):
+        d.mkdir()
+        (d / "a.json").write_text("{}")
+    old = time.time() - batch.SPOOL_TTL_S - 60
+    os.utime(stale, (old, old))
+    os.utime(other, (old, old))
+
+    assert sweep_stale_spools(root=str(tmp_path)) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([fresh.name, other.name])
+
+    # 续期后的暂存区不会被清理
+    os.utime(fresh, (old, old))
+    BatchSpool(str(fresh)).touch()
+    assert sweep_stale_spools(root=str(tmp_path)) == 0
+
+def _jsonl_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_jsonl_spool_one_line_per_file(tmp_path, template, compress):
+    spool = run_batch(
+        _uploads(3) + [Upload(b"not a workbook", "broken.xlsx")], template, RUN_MODES[-1],
+        spool=JsonlSpool(str(tmp_path), compress=compress)
+    )
+    assert spool.path.endswith(".jsonl.gz" if compress else ".jsonl")
+    lines = _jsonl_lines(spool.path)
+    # 失败的文件不写行，只出现在摘要中
+    assert len(lines) == 3
+    assert [s["line"] for s in spool.summaries if s["status"] == "ok"] == [1, 2, 3]
+
+    for n, line in enumerate(lines):
+        envelope = json.loads(line)
+        assert list(envelope) == ["source", "ems_count", "rl_count", "rec_count", "doc_count", "kpi_count", "ems_flag", "document"]
+        assert envelope["source"] == f"wb{n}.xlsx"
+        assert (envelope["ems_count"], envelope["rl_count"], envelope["rec_count"], envelope["ems_flag"]) == (1, 1, 1, "1")
+        assert envelope["document"]["OrganizationInformation"]["OrganizationName"] == f"合成测试组织 {n}"
+
+def test_jsonl_spool_patch_documents(tmp_path, template):
+    spool = run_batch(_uploads(2), template, RUN_MODES[0], spool=JsonlSpool(str(tmp_path)), as_patch=True)
+    for line in _jsonl_lines(spool.path):
+        envelope = json.loads(line)
+        assert is_delta(envelope["document"])
+        assert envelope["ems_count"] == 0
+
+# =====================================================================
+# 批量主循环
+# =====================================================================
+def test_run_batch_converts_every_file(tmp_path, template):
+    done = []
+    files = _uploads(3) + [Upload(b"not a workbook", "broken.xlsx")]
+    spool = run_batch(files, template, RUN_MODES[-1], spool=BatchSpool(str(tmp_path)), progress=lambda i, n: done.append((i, n)))
+    assert [s["status"] for s in spool.summaries] == ["ok", "ok", "ok", "error"]
+    assert done == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    assert all(s["ems_count"] == 1 and s["rl_count"] == 1 for s in spool.summaries[:3])
+
+def test_run_batch_patch_output(tmp_path, template):
+    spool = run_batch(_uploads(1), template, RUN_MODES[0], spool=BatchSpool(str(tmp_path)), as_patch=True)
+    delta = json.loads(spool.read_bytes(spool.summaries[0]["path"]))
+    assert is_delta(delta)
+    assert apply_delta(template, delta)["OrganizationInformation"]["OrganizationName"] == "合成测试组织 0"
+
+def test_memory_budget_applies_back_pressure_without_dropping_files(tmp_path, template, monkeypatch):
+    # RSS 突增后不再回落（共享服务中的常见情形）：每个文件都照常转换，超出时触发回收
+    readings = iter([100, 100, 1300] + [1300] * 20)
+    monkeypatch.setattr(batch, "current_rss_mb", lambda: next(readings))
+    collections = []
+    monkeypatch.setattr(batch.gc, "collect", lambda: collections.append(1))
+
+    spool = run_batch(_uploads(5), template, RUN_MODES[0], memory_budget_mb=512, spool=BatchSpool(str(tmp_path)))
+    assert [s["status"] for s in spool.summaries] == ["ok"] * 5
+    assert len(collections) == 1 + 4
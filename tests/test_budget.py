@@ -0,0 +1,69 @@
+import json
+import re
+import threading
+import time
+
+import pytest
+
+from factories import RUN_MODES
+from budget import ConversionBudget
+from engine import generate_json_logic
+from layout import LayoutCache
+from pipeline import convert_workbook
+from snapshot import SnapshotStore
+
+def _normalized(doc):
+    # 去掉每次转换都会重新生成的文档标识、时间戳与 Id
+    text = json.dumps(doc, ensure_ascii=False, sort_keys=True)
+    text = re.sub(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", "<id>", text)
+    return re.sub(r'"created": \d+', '"created": 0', text)
+
+# =====================================================================
+# 单文件预算
+# =====================================================================
+def test_time_budget_is_enforced():
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        ConversionBudget(time_budget_s=1).run(time.sleep, 30)
+    assert time.monotonic() - started < 10
+
+def test_memory_budget_is_enforced():
+    with pytest.raises(MemoryError):
+        ConversionBudget(memory_budget_mb=256).run(bytearray, 4 * 1024 ** 3)
+
+def test_budgeted_conversion_matches_direct(tmp_path, template, workbook):
+    snapshots, layouts = SnapshotStore(str(tmp_path)), LayoutCache(str(tmp_path / "layouts.json"))
+    budget = ConversionBudget(time_budget_s=60)
+    mode = RUN_MODES[-1]
+    expected = _normalized(generate_json_logic(workbook, template, mode)[0])
+
+    first = convert_workbook(workbook, template, mode, snapshots=snapshots, layouts=layouts, budget=budget)
+    # 子进程解析出的表格由本进程写入快照，识别出的布局并入本进程的布局缓存
+    assert snapshots.stats()["entries"] == 1
+    assert layouts.stats()["layouts"] == 6
+    second = convert_workbook(workbook, template, mode, snapshots=snapshots, layouts=layouts, budget=budget)
+    assert _normalized(first[0]) == _normalized(second[0]) == expected
+
+def test_locks_held_by_other_sessions_do_not_stall_the_child(tmp_path, template, workbook):
+    # 其它会话线程恰好持有共享对象的锁时启动预算子进程：子进程不继承这些锁，转换照常完成
+    snapshots, layouts = SnapshotStore(str(tmp_path)), LayoutCache(str(tmp_path / "layouts.json"))
+    holding, release = threading.Event(), threading.Event()
+    def other_session():
+        with snapshots._lock, layouts._lock:
+            holding.set()
+            release.wait(10)
+    holder = threading.Thread(target=other_session)
+    holder.start()
+    holding.wait(5)
+    threading.Timer(2, release.set).start()
+
+    started = time.monotonic()
+    try:
+        res_json, _, _ = convert_workbook(
+            workbook, template, RUN_MODES[0], snapshots=snapshots, layouts=layouts, budget=ConversionBudget(time_budget_s=10)
+        )
+    finally:
+        release.set()
+        holder.join()
+    assert res_json["OrganizationInformation"]["OrganizationName"]
+    assert time.monotonic() - started < 10
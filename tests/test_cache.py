@@ -0,0 +1,43 @@
+import os
+import time
+
+from cache import ConversionCache, conversion_key, template_hash
+
+def _key(n):
+    return conversion_key(bytes([n]), "tpl", "mode")
+
+# =====================================================================
+# 缓存键
+# =====================================================================
+def test_key_depends_on_every_part():
+    base = conversion_key(b"wb", "tpl", "mode")
+    assert base == conversion_key(b"wb", "tpl", "mode")
+    assert len({base, conversion_key(b"wb2", "tpl", "mode"), conversion_key(b"wb", "tpl2", "mode"),
+                conversion_key(b"wb", "tpl", "mode2"), conversion_key(b"wb", "tpl", "mode", engine_version="v0")}) == 5
+
+def test_template_hash_ignores_key_order():
+    assert template_hash({"a": 1, "b": [1, 2]}) == template_hash({"b": [1, 2], "a": 1})
+    assert template_hash({"a": 1}) != template_hash({"a": 1.5})
+
+# =====================================================================
+# 持久化转换缓存
+# =====================================================================
+def test_put_get_round_trip(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    assert cache.get(_key(1)) is None
+    cache.put(_key(1), {"Processes": [{"Id": "p"}]}, 3, 4)
+    assert cache.get(_key(1)) == ({"Processes": [{"Id": "p"}]}, 3, 4)
+    # 另一个实例（其它进程）读到同一份条目
+    assert ConversionCache(str(tmp_path)).get(_key(1)) is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    for n in range(3):
+        cache.put(_key(n), {"payload": "x" * 1000}, 0, 0)
+        os.utime(cache._entry_path(_key(n)), (time.time() - 100 + n, time.time() - 100 + n))
+    cache.get(_key(0))
+    cache.max_bytes = cache.stats()["bytes"] - 1
+    cache.evict()
+    assert [cache.get(_key(n)) is not None for n in range(3)] == [True, False, True]
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,61 @@
+import copy
+import json
+
+import pytest
+
+from factories import RUN_MODES
+from cache import template_hash
+from delta import apply_delta, apply_delta_lines, make_delta
+from engine import generate_json_variants
+
+def _dumps(doc):
+    # 按序列化结果比较：键顺序与 1 / 1.0 / true 的区别都计入
+    return json.dumps(doc, ensure_ascii=False)
+
+@pytest.fixture(scope="module")
+def outputs(template, workbook):
+    return generate_json_variants(workbook, template, RUN_MODES)
+
+@pytest.fixture(scope="module")
+def filled_template(template, other_workbook):
+    # 引擎写入的字段在底座中已存在（且取值不同）时，补丁走 replace 分支
+    full_mode = RUN_MODES[-1]
+    return generate_json_variants(other_workbook, template, (full_mode,))[full_mode][0]
+
+# =====================================================================
+# 回归：build() 写入的每个字段都必须出现在补丁里
+# =====================================================================
+@pytest.mark.parametrize("mode", RUN_MODES)
+def test_round_trip_from_skeleton(template, outputs, mode):
+    out = outputs[mode][0]
+    delta = json.loads(json.dumps(make_delta(template, out)))
+    assert _dumps(apply_delta(template, delta)) == _dumps(out)
+
+@pytest.mark.parametrize("mode", RUN_MODES)
+def test_round_trip_from_filled_template(filled_template, workbook, mode):
+    out = generate_json_variants(workbook, filled_template, (mode,))[mode][0]
+    delta = json.loads(json.dumps(make_delta(filled_template, out)))
+    assert apply_delta(filled_template, delta) == out
+
+def test_apply_does_not_mutate_template(template, outputs):
+    before = copy.deepcopy(template)
+    apply_delta(template, make_delta(template, outputs[RUN_MODES[-1]][0]))
+    assert template == before
+
+def test_template_mismatch_is_rejected(template, outputs):
+    delta = make_delta(template, outputs[RUN_MODES[0]][0])
+    other = dict(template, uuid="another-template")
+    with pytest.raises(ValueError):
+        apply_delta(other, delta)
+
+def test_apply_delta_lines(template, outputs):
+    tpl_hash = template_hash(template)
+    out = outputs[RUN_MODES[-1]][0]
+    lines = [
+        json.dumps({"name": "a.xlsx", "document": make_delta(template, out, tpl_hash)}, ensure_ascii=False) + "\n",
+        json.dumps({"name": "b.xlsx", "document": out}, ensure_ascii=False) + "\n",
+    ]
+    restored = [json.loads(line) for line in apply_delta_lines(template, lines, tpl_hash)]
+    assert [r["name"] for r in restored] == ["a.xlsx", "b.xlsx"]
+    assert restored[0]["document"] == out
+    assert restored[1]["document"] == out
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import engine as E
+from factories import RUN_MODES
+
+def _xlsx(rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "数据库"
+    for r, values in rows:
+        for c, v in enumerate(values, start=1):
+            ws.cell(r, c, v)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def _normalized(doc):
+    # 去掉每次转换都会重新生成的文档标识、时间戳与 Id
+    text = json.dumps(doc, ensure_ascii=False, sort_keys=True)
+    text = re.sub(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", "<id>", text)
+    return re.sub(r'"created": \d+', '"created": 0', text)
+
+# =====================================================================
+# 有效区域裁剪
+# =====================================================================
+def test_trims_trailing_blank_rows_and_columns():
+    df = pd.DataFrame([["a", None, None], [None, "b", " "], [None, None, None], ["\t", np.nan, ""]], dtype=object)
+    trimmed = E.trim_used_range(df)
+    assert trimmed.shape == (2, 2)
+    assert trimmed.iat[1, 1] == "b"
+
+def test_keeps_interior_blanks_and_origin():
+    df = pd.DataFrame([[None, None, None], [None, None, "x"]], dtype=object)
+    trimmed = E.trim_used_range(df)
+    # 左上角原点不动：前导空行空列保留，行列下标与原表一致
+    assert trimmed.shape == (2, 3)
+
+def test_untouched_frame_is_returned_as_is():
+    df = pd.DataFrame([["a", 1], ["b", 2]])
+    assert E.trim_used_range(df) is df
+
+def test_all_blank_and_empty_frames():
+    assert E.trim_used_range(pd.DataFrame([[None, " "], ["", np.nan]], dtype=object)).shape == (0, 0)
+    empty = pd.DataFrame()
+    assert E.trim_used_range(empty) is empty
+
+def test_named_columns_are_kept_without_data():
+    df = pd.DataFrame([["p", None, None]], columns=["过程", "负责人", "Unnamed: 2"], dtype=object)
+    assert list(E.trim_used_range(df).columns) == ["过程", "负责人"]
+
+# =====================================================================
+# 行数上限
+# =====================================================================
+def test_blank_formatting_past_the_cap_is_trimmed(monkeypatch):
+    monkeypatch.setattr(E, "MAX_SHEET_ROWS", 5)
+    data = _xlsx([(1, ("a",)), (2, ("b",))] + [(r, (" ",)) for r in range(3, 12)])
+    assert E.read_workbook_frames(data)["db"].shape == (2, 1)
+
+@pytest.mark.parametrize("reader", ["serial", "parallel"])
+def test_data_past_the_cap_is_an_error(monkeypatch, reader):
+    monkeypatch.setattr(E, "MAX_SHEET_ROWS", 5)
+    data = _xlsx([(r, (f"v{r}",)) for r in range(1, 8)])
+    with pytest.raises(ValueError, match="读取上限"):
+        if reader == "serial":
+            E.read_workbook_frames(data)
+        else:
+            # 直接调用工作进程函数：进程池中的子进程看不到 monkeypatch
+            E._read_sheet(data, "数据库", None)
+
+# =====================================================================
+# 并行解析
+# =====================================================================
+@pytest.fixture
+def sheet_pool():
+    pool = E.make_sheet_pool(2)
+    yield pool
+    pool.shutdown()
+
+def _assert_same_frames(frames, expected):
+    for key in E.SHEET_KEYS:
+        assert frames[key].shape == expected[key].shape
+        assert (frames[key].columns == expected[key].columns).all()
+        assert (frames[key].fillna("").values == expected[key].fillna("").values).all()
+
+def test_parallel_frames_match_serial(workbook, sheet_pool):
+    _assert_same_frames(E.read_workbook_frames_parallel(workbook, sheet_pool), E.read_workbook_frames(workbook))
+
+def test_broken_pool_is_rebuilt(workbook, sheet_pool):
+    # 工作进程异常退出后进程池不可再用，下一次解析时重建
+    with pytest.raises(Exception):
+        sheet_pool.submit(os._exit, 1).result()
+    _assert_same_frames(E.read_workbook_frames_parallel(workbook, sheet_pool), E.read_workbook_frames(workbook))
+
+# =====================================================================
+# 多模式一次提取
+# =====================================================================
+def test_variants_match_single_mode_conversion(template, workbook):
+    variants = E.generate_json_variants(workbook, template, RUN_MODES)
+    for mode in RUN_MODES:
+        expected = E.generate_json_logic(workbook, template, mode)
+        assert _normalized(variants[mode][0]) == _normalized(expected[0])
+        assert variants[mode][1:] == expected[1:]
+
+def test_each_variant_gets_its_own_generated_ids(template, workbook):
+    variants = E.generate_json_variants(workbook, template, RUN_MODES)
+    template_ids = E.collect_ids(template, set())
+    seen = set()
+    for mode in RUN_MODES:
+        ids = E.collect_ids(variants[mode][0], set())
+        # 继承自底座模板的 Id 保持不变，其余 Id 在各模式之间互不重复
+        assert template_ids <= ids
+        generated = ids - template_ids
+        assert generated and not generated & seen
+        seen |= generated
@@ -0,0 +1,107 @@
+import timeit
+
+import pandas as pd
+import pytest
+
+from factories import RUN_MODES, make_workbook
+import engine as E
+from layout import LayoutCache
+
+SECTIONS = {
+    "perf": ("perf", E.PERF_WINDOW, E._perf_header_at, E.discover_perf_layout),
+    "customers": ("info", E.CUSTOMER_WINDOW, E._customer_header_at, E.discover_customer_layout),
+    "doc": ("doc", E.DOC_WINDOW, E._doc_header_at, E.discover_doc_layout),
+}
+for _site in ("ems", "rl", "rec"):
+    SECTIONS[_site] = (
+        "info", E.SITE_WINDOWS[_site],
+        (lambda s: lambda df, r: E._site_header_at(s, df, r))(_site),
+        (lambda s: lambda df: E.discover_site_layout(s, df))(_site),
+    )
+
+def _resolve(cache, section, frames, discover=None):
+    sheet, window, header_at, default_discover = SECTIONS[section]
+    return cache.resolve(section, frames[sheet], window, header_at, discover or default_discover)
+
+def _counting(section):
+    calls = []
+    def discover(df):
+        calls.append(1)
+        return SECTIONS[section][3](df)
+    return discover, calls
+
+@pytest.fixture(scope="module")
+def frames():
+    return E.read_workbook_frames(make_workbook(1))
+
+# =====================================================================
+# 表头布局缓存
+# =====================================================================
+@pytest.mark.parametrize("section", SECTIONS)
+def test_hit_matches_discovery(tmp_path, frames, section):
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    expected = SECTIONS[section][3](frames[SECTIONS[section][0]])
+    assert _resolve(cache, section, frames) == expected
+    assert _resolve(cache, section, frames) == expected
+    assert cache.stats() == {"hits": 1, "misses": 1, "layouts": 1}
+
+def test_other_workbooks_of_the_same_template_hit(tmp_path):
+    # 数据行与表头上方的内容（组织名称、证书号）因文件而异，不影响命中
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    for seed in (1, 2, 3):
+        E.generate_json_variants(make_workbook(seed, n_processes=3 + seed), {}, RUN_MODES[-1:], layouts=cache)
+    assert cache.stats() == {"hits": 12, "misses": 6, "layouts": 6}
+
+def test_changed_header_is_rediscovered(tmp_path, frames):
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    discover, calls = _counting("ems")
+    _resolve(cache, "ems", frames, discover)
+    moved = frames["info"].astype(object)
+    moved.iat[21, 8], moved.iat[21, 9] = moved.iat[21, 9], moved.iat[21, 8]
+    header_r, col_map = _resolve(cache, "ems", dict(frames, info=moved), discover)
+    assert len(calls) == 2
+    assert (col_map["addr_en"], col_map["zip"]) == (9, 8)
+
+def test_absent_section_is_not_stored(tmp_path):
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    frames = E.read_workbook_frames(make_workbook(1, support_sites=False))
+    for _ in range(2):
+        assert _resolve(cache, "rl", frames)[0] == -1
+    assert cache.stats() == {"hits": 0, "misses": 2, "layouts": 0}
+
+def test_headers_split_across_rows_are_not_cached(tmp_path):
+    # 条款列与文件列表头不在同一行：表头行单独无法复现列映射，每次完整扫描
+    doc = pd.DataFrame([["标准条款", None], [None, "公司内对应的程序文件"], ["4.1", "QP-01"]], dtype=object)
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    for _ in range(2):
+        assert _resolve(cache, "doc", {"doc": doc}) == (1, {"clause": 0, "doc": 1})
+    assert cache.stats()["layouts"] == 0
+
+def test_layouts_persist_across_instances(tmp_path, frames):
+    path = str(tmp_path / "layouts.json")
+    _resolve(LayoutCache(path), "perf", frames)
+    reloaded = LayoutCache(path)
+    _resolve(reloaded, "perf", frames)
+    assert reloaded.stats()["hits"] == 1
+
+def test_store_is_capped(tmp_path, frames):
+    cache = LayoutCache(str(tmp_path / "layouts.json"), max_entries=2)
+    for n in range(4):
+        info = frames["info"].astype(object)
+        info.iat[21, 12] = f"备注{n}"
+        _resolve(cache, "ems", dict(frames, info=info))
+    assert cache.stats()["layouts"] == 2
+
+# =====================================================================
+# 基准：命中必须比完整扫描便宜，否则缓存没有意义
+# =====================================================================
+@pytest.mark.parametrize("section", SECTIONS)
+def test_hit_is_cheaper_than_discovery(tmp_path, frames, section):
+    cache = LayoutCache(str(tmp_path / "layouts.json"))
+    df = frames[SECTIONS[section][0]]
+    discover = SECTIONS[section][3]
+    _resolve(cache, section, frames)
+
+    hit = min(timeit.repeat(lambda: _resolve(cache, section, frames), number=50, repeat=5))
+    scan = min(timeit.repeat(lambda: discover(df), number=50, repeat=5))
+    assert hit < scan, f"{section}: hit {hit / 50 * 1e6:.0f} us >= discovery {scan / 50 * 1e6:.0f} us"
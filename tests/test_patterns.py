@@ -0,0 +1,50 @@
+import re
+
+import pytest
+
+import patterns as P
+
+# 原地址拆分逻辑逐行使用的两条正则，classify 必须与之一致
+_OLD_ZH = re.compile(r'[\u4e00-\u9fff]')
+_OLD_EN = re.compile(r'[a-zA-Z]{3,}')
+
+LINES = [
+    "", " ", "abc", "ab", "a b c", "中国", "江苏省苏州市工业园区星湖街 328 号",
+    "No. 328 Xinghu Street, Suzhou", "地址：No.328 Xinghu St. 苏州", "Suzhou 苏州", "苏州 Suzhou",
+    "AB 中 CD", "ABC123", "12345", "（邮编 215000）", "Ｆｕｌｌｗｉｄｔｈ", "Ünïcödé street", "ab中cd",
+    "IATF-0123456", "2024-03-01", "中" * 50 + "abc", "abc" + "中" * 50,
+]
+
+# =====================================================================
+# 文本分类
+# =====================================================================
+@pytest.mark.parametrize("line", LINES)
+def test_classify_agrees_with_old_regexes(line):
+    feats = P.classify(line)
+    assert feats.has_cjk == bool(_OLD_ZH.search(line))
+    assert feats.has_latin_run == bool(_OLD_EN.search(line))
+
+@pytest.mark.parametrize("text, is_date, is_id", [
+    ("2024-03-01", True, False),
+    ("2024年3月1日", True, False),
+    ("2024/03/01 09:30", True, False),
+    ("5-ABC-123456", False, True),
+    ("USI000001", False, True),
+    ("215000", False, True),
+    ("ABCDEF", False, False),
+    ("编号123456", False, False),
+    ("A 123456", False, False),
+])
+def test_id_and_date_are_computed_on_demand(text, is_date, is_id):
+    assert P.is_date(text) is is_date
+    assert P.is_id(text) is is_id
+
+def test_split_bilingual_matches_old_logic():
+    # 与原先逐行内联的拆分写法逐一比对
+    for line in LINES:
+        en_str = re.sub(r'[\u4e00-\u9fff]', ' ', line)
+        en_str = re.sub(r'[，。；（）]', ' ', en_str)
+        en_str = re.sub(r'\s+', ' ', en_str).strip(" ()-.,")
+        zh_str = re.sub(r'[a-zA-Z]', '', line)
+        zh_str = re.sub(r'\s+', ' ', zh_str).strip(" ()-.,")
+        assert P.split_bilingual(line) == (en_str, zh_str)
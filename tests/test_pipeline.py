@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from factories import RUN_MODES
+from cache import ConversionCache
+from engine import collect_ids
+from pipeline import SingleFlight, _as_new_document, convert_workbook
+
+# =====================================================================
+# 并发合并
+# =====================================================================
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls, release = [], threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    results = []
+    def caller():
+        results.append(flight.do("k", work))
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    for t in threads: t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads: t.join(5)
+
+    assert len(calls) == 1
+    assert [r[0]["value"] for r in results] == [42] * 4
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    errors = []
+    def caller():
+        try: flight.do("k", work)
+        except ValueError as e: errors.append(str(e))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5); follower.join(5)
+    assert errors == ["boom", "boom"]
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+    with pytest.raises(KeyError):
+        flight.do("k", lambda: {}["missing"])
+    assert flight.do("k", lambda: 3) == (3, False)
+
+def test_concurrent_sessions_share_one_conversion(monkeypatch, template, workbook):
+    import pipeline
+    calls, real = [], pipeline._convert_and_store
+    def slow_store(*args):
+        calls.append(1)
+        time.sleep(0.2)
+        return real(*args)
+    monkeypatch.setattr(pipeline, "_convert_and_store", slow_store)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(convert_workbook(workbook, template, RUN_MODES[0])[0])) for _ in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join(30)
+
+    assert len(calls) == 1 and len(results) == 3
+    # 每个会话拿到独立的文档对象与文档标识
+    assert len({id(r) for r in results}) == 3
+    assert len({r["uuid"] for r in results}) == 3
+
+# =====================================================================
+# 复用结果视同新文档
+# =====================================================================
+def test_reused_result_gets_fresh_engine_ids():
+    base = {"Processes": [{"Id": "tpl-1"}]}
+    doc = {
+        "uuid": "u", "created": 0,
+        "Processes": [{"Id": "tpl-1"}, {"Id": "gen-1", "Ref": {"Id": "gen-1"}}],
+    }
+    renewed, _, _ = _as_new_document((doc, 0, 0), base)
+    procs = renewed["Processes"]
+    assert procs[0]["Id"] == "tpl-1"
+    assert procs[1]["Id"] != "gen-1"
+    assert procs[1]["Ref"]["Id"] == procs[1]["Id"]
+    assert renewed["uuid"] != "u"
+    assert collect_ids(renewed, set()) == {"tpl-1", procs[1]["Id"]}
+
+def test_cache_hit_does_not_repeat_ids(tmp_path, template, workbook):
+    cache = ConversionCache(str(tmp_path))
+    mode = RUN_MODES[-1]
+    first = convert_workbook(workbook, template, mode, cache=cache)[0]
+    second = convert_workbook(workbook, template, mode, cache=cache)[0]
+    assert cache.hits == 1
+
+    template_ids = collect_ids(template, set())
+    first_ids, second_ids = collect_ids(first, set()), collect_ids(second, set())
+    assert template_ids <= first_ids
+    assert first_ids & second_ids == template_ids
+    assert first["uuid"] != second["uuid"]
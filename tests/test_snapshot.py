@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import SHEET_KEYS, read_workbook_frames
+from snapshot import SnapshotStore, _decode_frame, _encode_frame
+
+def _save_encoded(df, prefix):
+    codes, offsets, blob, columns = _encode_frame(df)
+    np.save(prefix + ".codes.npy", codes)
+    np.save(prefix + ".offsets.npy", offsets)
+    with open(prefix + ".strings.bin", "wb") as f:
+        f.write(blob)
+    return columns
+
+# =====================================================================
+# 列式编码
+# =====================================================================
+def test_encode_decode_round_trip(tmp_path):
+    df = pd.DataFrame([["过程", 1, None], [2.5, "过程", "KPI名称"], [np.nan, "", "ÄÖ"]])
+    prefix = str(tmp_path / "frame")
+    decoded = _decode_frame(prefix, _save_encoded(df, prefix))
+    assert decoded.shape == df.shape
+    # 快照只保存 str() 形式，空单元格还原为 NaN
+    for r in range(df.shape[0]):
+        for c in range(df.shape[1]):
+            v = df.iat[r, c]
+            if pd.isna(v): assert pd.isna(decoded.iat[r, c])
+            else: assert decoded.iat[r, c] == str(v)
+
+def test_named_columns_and_empty_frame(tmp_path):
+    named = pd.DataFrame({"a": ["x"], "b": [None]})
+    prefix = str(tmp_path / "named")
+    assert list(_decode_frame(prefix, _save_encoded(named, prefix)).columns) == ["a", "b"]
+
+    prefix = str(tmp_path / "empty")
+    assert _decode_frame(prefix, _save_encoded(pd.DataFrame(), prefix)).empty
+
+# =====================================================================
+# 快照仓库
+# =====================================================================
+def test_store_round_trip(tmp_path, workbook):
+    store = SnapshotStore(str(tmp_path))
+    digest = store.digest(workbook)
+    assert store.load(digest) is None
+
+    frames = read_workbook_frames(workbook)
+    store.save(digest, frames)
+    loaded = store.load(digest)
+    for key in SHEET_KEYS:
+        expected = frames[key].to_numpy(dtype=object)
+        actual = loaded[key].to_numpy(dtype=object)
+        assert actual.shape == expected.shape
+        assert (pd.isna(actual) == pd.isna(expected)).all()
+        assert all(str(a) == str(e) for a, e in zip(actual[~pd.isna(actual)], expected[~pd.isna(expected)]))
+
+def test_store_evicts_least_recently_used(tmp_path, workbook):
+    store = SnapshotStore(str(tmp_path))
+    frames = read_workbook_frames(workbook)
+    digests = [store.digest(workbook + bytes([i])) for i in range(3)]
+    for digest in digests:
+        store.save(digest, frames)
+        time.sleep(0.01)
+    size = store.stats()["bytes"] // 3
+
+    # 读取第一个快照后，第二个成为最久未用
+    assert store.load(digests[0]) is not None
+    store.max_bytes = int(size * 2.5)
+    store.evict()
+    assert [store.load(d) is not None for d in digests] == [True, False, True]
+    assert store.stats()["entries"] == 2